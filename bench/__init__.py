@@ -0,0 +1,7 @@
+"""Benchmarks for the hot paths of the application.
+
+Each module is run from the top directory of the repository, e.g.
+
+    python3 -m bench.speedtype_state
+
+"""
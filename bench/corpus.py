@@ -0,0 +1,175 @@
+# coding: utf-8
+"""Generates a synthetic corpus with the shape of a Bible translation.
+
+The corpus has the 66 books with their real numbers of chapters, and
+about 31,000 verses in all.  The words are drawn from the example
+passage with a Zipf-like distribution.  Sentences run across verses,
+are punctuated with the delimiters sentence.sentences_cons2() splits
+on, and a few run on for a dozen clauses, as in the epistles.
+
+The verses are records like those bridge.verse returns.  Generating is
+deterministic for a seed, so timings are comparable between runs.
+
+    python3 -m bench.corpus [--database NAME]
+
+prints the size of the corpus, or writes it into a database.
+
+"""
+
+import argparse
+import random
+import re
+
+"""Books and their numbers of chapters."""
+BOOKS = [
+    ('Gen', 50), ('Exo', 40), ('Lev', 27), ('Num', 36), ('Deu', 34),
+    ('Jos', 24), ('Jdg', 21), ('Rut', 4), ('1Sa', 31), ('2Sa', 24),
+    ('1Ki', 22), ('2Ki', 25), ('1Ch', 29), ('2Ch', 36), ('Ezr', 10),
+    ('Neh', 13), ('Est', 10), ('Job', 42), ('Psa', 150), ('Pro', 31),
+    ('Ecc', 12), ('Sng', 8), ('Isa', 66), ('Jer', 52), ('Lam', 5),
+    ('Eze', 48), ('Dan', 12), ('Hos', 14), ('Joe', 3), ('Amo', 9),
+    ('Oba', 1), ('Jon', 4), ('Mic', 7), ('Nah', 3), ('Hab', 3),
+    ('Zep', 3), ('Hag', 2), ('Zec', 14), ('Mal', 4), ('Mat', 28),
+    ('Mar', 16), ('Luk', 24), ('Jhn', 21), ('Act', 28), ('Rom', 16),
+    ('1Co', 16), ('2Co', 13), ('Gal', 6), ('Eph', 6), ('Phl', 4),
+    ('Col', 4), ('1Th', 5), ('2Th', 3), ('1Ti', 6), ('2Ti', 4),
+    ('Tit', 3), ('Phm', 1), ('Heb', 13), ('Jas', 5), ('1Pe', 5),
+    ('2Pe', 3), ('1Jo', 5), ('2Jo', 1), ('3Jo', 1), ('Jud', 1),
+    ('Rev', 22),
+]
+
+"""Range of the number of verses in a chapter.  With 1,189 chapters,
+this comes to about 31,000 verses."""
+MIN_VERSES = 10
+MAX_VERSES = 42
+
+"""The longest chapter, Psa 119, has as many verses as bridge.verse
+can return at once."""
+LONGEST_CHAPTER = ('Psa', 119, 176)
+
+"""Mean and spread of the number of words in a verse."""
+VERSE_WORDS = 25
+VERSE_WORDS_SPREAD = 8
+
+"""Verses are kept shorter than the text of bridge.verse.Verse."""
+MAX_VERSE_BYTES = 480
+
+"""Chance of a sentence running on, and how many clauses it takes."""
+RUN_ON_RATE = 0.1
+RUN_ON_CLAUSES = (6, 12)
+
+"""Punctuation between clauses and at the end of a sentence, with
+their weights."""
+CLAUSE_BREAKS = [(',', 6), (', and', 4), (';', 2), (':', 1)]
+SENTENCE_ENDS = [('.', 20), ('?', 2), ('!', 1)]
+
+def vocabulary():
+    """Returns the words of the example passage, the most frequent
+    first."""
+    with open('example.txt') as f:
+        text = f.read().split(']', 1)[1]
+    counts = {}
+    for word in re.findall(r"[A-Za-z']+", text):
+        counts[word] = counts.get(word, 0) + 1
+    return sorted(counts, key=lambda word: -counts[word])
+
+def sentences(rand, words):
+    """Yields sentences without end."""
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    (breaks, break_weights) = zip(*CLAUSE_BREAKS)
+    (ends, end_weights) = zip(*SENTENCE_ENDS)
+
+    while True:
+        if rand.random() < RUN_ON_RATE:
+            clauses = rand.randint(*RUN_ON_CLAUSES)
+        else:
+            clauses = rand.randint(1, 3)
+
+        parts = []
+        for i in range(clauses):
+            clause = rand.choices(words, weights, k=rand.randint(3, 12))
+            if i == 0:
+                clause[0] = clause[0].capitalize()
+            parts.append(' '.join(clause))
+            if i < clauses - 1:
+                parts.append(rand.choices(breaks, break_weights)[0] + ' ')
+        parts.append(rand.choices(ends, end_weights)[0])
+        yield ''.join(parts)
+
+def generate(seed=0):
+    """Returns the verses of the corpus as records with the key, the
+    text and the deleted flag."""
+    rand = random.Random(seed)
+    stream = _words(sentences(rand, vocabulary()))
+
+    records = []
+    for (book, chapters) in BOOKS:
+        for chapter in range(1, chapters + 1):
+            if (book, chapter) == LONGEST_CHAPTER[:2]:
+                verses = LONGEST_CHAPTER[2]
+            else:
+                verses = rand.randint(MIN_VERSES, MAX_VERSES)
+
+            for verse in range(1, verses + 1):
+                count = max(3, int(rand.gauss(VERSE_WORDS,
+                                              VERSE_WORDS_SPREAD)))
+                text = []
+                size = 0
+                for _ in range(count):
+                    word = next(stream)
+                    text.append(word)
+                    size += len(word) + 1
+                    if size >= MAX_VERSE_BYTES - 40:
+                        break
+                records.append({
+                    'key': '{0} {1}:{2}'.format(book, chapter, verse),
+                    'text': ' '.join(text),
+                    'deleted': '0',
+                })
+    return records
+
+def find_chapter(records, book, chapter):
+    """Returns the records of the chapter, like
+    bridge.verse.find_by_book_and_chapter()."""
+    prefix = '{0} {1}:'.format(book, chapter)
+    return [rec for rec in records if rec['key'].startswith(prefix)]
+
+def write_database(records, translation):
+    """Writes the records into the database of the translation, which
+    must not exist yet.  Needs libsdb."""
+    import config
+    from sdb.sdb import Sdb
+
+    path = translation + config.DB_EXT
+    Sdb.create(path)
+    with Sdb(path) as database:
+        database.create_table('verse.mjson')
+        verse_table = [table for table in database.get_tables()
+                       if table.name() == 'verse'][0]
+        verse_table.create_manager()
+        verse_table.verify()
+        verse_table.service()
+        for rec in records:
+            verse_table.insert(rec)
+
+def _words(sentences):
+    for sentence in sentences:
+        yield from sentence.split(' ')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database',
+                        help='translation to write the corpus into')
+    opts = parser.parse_args()
+
+    records = generate(opts.seed)
+    if opts.database is not None:
+        write_database(records, opts.database)
+
+    size = sum(len(rec['text']) for rec in records)
+    print('{0} verses, {1} characters, longest verse {2}'.format(
+        len(records), size, max(len(rec['text']) for rec in records)))
+
+if __name__ == '__main__':
+    main()
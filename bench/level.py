@@ -0,0 +1,74 @@
+# coding: utf-8
+"""Measures applying difficulty levels to a large speedtype buffer.
+
+Loads about 30,000 characters into bridge.speedtype.State, then times
+every level change and toggling single words.  Toggling through the
+word index is compared against scanning the buffer for the letters of
+the word, which is how words used to be hidden.
+
+libmvpcore must be found in LD_LIBRARY_PATH.
+
+"""
+
+import time
+from bench.speedtype_state import example_lines
+from bridge.speedtype import State
+
+"""Number of characters to load into the buffer."""
+BUFFER_SIZE = 30000
+
+"""Number of words to toggle by scanning the buffer.  Scanning is slow,
+so only a sample is timed."""
+SCAN_SAMPLE = 200
+
+def make_state():
+    """Loads at least BUFFER_SIZE characters into a new State."""
+    lines = example_lines()
+    size = sum(len(line) + 1 for line in lines)
+    state = State()
+    state.process_lines(lines * (BUFFER_SIZE // size + 1))
+    return state
+
+def time_levels(state):
+    """Times going up through the levels and back down."""
+    timings = []
+    for level in [1, 2, 3, 4, 3, 2, 1, 0]:
+        start = time.perf_counter()
+        state.apply_level(level)
+        timings.append((level, time.perf_counter() - start))
+    return timings
+
+def time_indexed_toggle(state):
+    """Times hiding every word through the index.  Returns the time per
+    word."""
+    start = time.perf_counter()
+    for word in state.words():
+        state.set_word_visible(word['id'], False)
+    return (time.perf_counter() - start) / len(state.words())
+
+def time_scanning_toggle(state):
+    """Times hiding a sample of words by scanning the buffer.  Returns
+    the time per word."""
+    words = state.words()[:SCAN_SAMPLE]
+    start = time.perf_counter()
+    for word in words:
+        word['visible'] = False
+        for ch in [ch for ch in state.buf() if ch['word'] == word['id']]:
+            ch['visible'] = False
+    return (time.perf_counter() - start) / len(words)
+
+def main():
+    state = make_state()
+    print('{0} characters, {1} words'.format(len(state.buf()),
+                                             len(state.words())))
+
+    for (level, elapsed) in time_levels(state):
+        print('apply level {0}: {1:8.2f} ms'.format(level, elapsed * 1e3))
+
+    print('hide word, indexed: {0:10.2f} us'.format(
+        time_indexed_toggle(state) * 1e6))
+    print('hide word, scanning: {0:9.2f} us'.format(
+        time_scanning_toggle(state) * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# coding: utf-8
+"""Measures finding the letters to paint on a book-length canvas.
+
+Lays out 100,000 letters in lines like SpeedTypeCanvas does, then
+times building a LineIndex and looking up viewport-sized clip regions.
+The per-pixel clip table it replaced is timed for a sample of rows and
+extrapolated to the height of the canvas, as building it in full
+would take hours.
+
+"""
+
+import random
+import time
+from lineindex import LineIndex
+
+LETTER_COUNT = 100000
+LETTERS_PER_LINE = 30
+LINE_SPACING = 30
+FONT_HEIGHT = 22
+VIEWPORT_HEIGHT = 800
+
+"""Number of rows of the clip table to time."""
+CLIPTABLE_SAMPLE = 20
+
+"""Number of clip regions to look up in the index."""
+LOOKUP_COUNT = 10000
+
+def letter_ys():
+    """Returns the y coordinate of every letter."""
+    return [(i // LETTERS_PER_LINE) * LINE_SPACING
+            for i in range(LETTER_COUNT)]
+
+def canvas_height(ys):
+    return ys[-1] + LINE_SPACING
+
+def cliptable_row(ct_info, y, fontheight):
+    """Works out one row of the old clip table."""
+    (first, second) = (None, None)
+
+    for (i, yclip) in enumerate(ct_info):
+        if y < yclip + fontheight:
+            first = i
+            break
+
+    for i in range(len(ct_info) - 1, -1, -1):
+        yclip = ct_info[i]
+        if y > yclip:
+            second = i
+            break
+
+    return (first, second)
+
+def time_cliptable(ys):
+    """Returns the estimated time to build the clip table."""
+    height = canvas_height(ys)
+    rows = random.sample(range(height), CLIPTABLE_SAMPLE)
+    start = time.perf_counter()
+    for y in rows:
+        cliptable_row(ys, y, FONT_HEIGHT)
+    return (time.perf_counter() - start) / len(rows) * height
+
+def time_index(ys):
+    """Returns the time to build the index and the time per lookup."""
+    start = time.perf_counter()
+    index = LineIndex(FONT_HEIGHT)
+    for y in ys:
+        index.append(y)
+    built = time.perf_counter() - start
+
+    height = canvas_height(ys)
+    tops = [random.randrange(height) for _ in range(LOOKUP_COUNT)]
+    start = time.perf_counter()
+    for top in tops:
+        index.letters_between(top, top + VIEWPORT_HEIGHT - 1)
+    lookup = (time.perf_counter() - start) / len(tops)
+
+    return (built, lookup)
+
+def check(ys):
+    """Checks the index agrees with the clip table on a sample of
+    rows."""
+    index = LineIndex(FONT_HEIGHT)
+    for y in ys:
+        index.append(y)
+
+    height = canvas_height(ys)
+    for top in random.sample(range(height - VIEWPORT_HEIGHT), 10):
+        bottom = top + VIEWPORT_HEIGHT - 1
+        first = cliptable_row(ys, top, FONT_HEIGHT)[0]
+        last = cliptable_row(ys, bottom, FONT_HEIGHT)[1]
+        assert index.letters_between(top, bottom) == range(first, last + 1)
+
+def main():
+    ys = letter_ys()
+    print('{0} letters, {1} px tall'.format(len(ys), canvas_height(ys)))
+
+    check(ys)
+    print('clip table, estimated: {0:10.2f} s'.format(time_cliptable(ys)))
+
+    (built, lookup) = time_index(ys)
+    print('line index, build: {0:14.2f} ms'.format(built * 1e3))
+    print('line index, lookup: {0:13.2f} us'.format(lookup * 1e6))
+
+if __name__ == '__main__':
+    main()
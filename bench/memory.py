@@ -0,0 +1,94 @@
+# coding: utf-8
+"""Reports the memory taken by the speedtype buffer.
+
+Builds the characters and words of a chapter and of a whole book both
+as the dictionaries the buffer used to hold and as the records
+bridge.speedtype.State holds now, and measures each with tracemalloc.
+
+"""
+
+import config
+import tracemalloc
+from bench.speedtype_state import example_lines
+from bridge.speedtype import CharacterRecord, WordRecord
+
+"""Sizes to report in number of characters.  The book is about the
+size of Isaiah."""
+SIZES = [('chapter', 4000), ('book', 180000)]
+
+def make_lines(size):
+    """Repeats the example passage until it has at least size
+    characters."""
+    lines = example_lines()
+    length = sum(len(line) + 1 for line in lines)
+    return lines * (size // length + 1)
+
+def make_dicts(lines):
+    """Splits the lines into characters and words the way the core
+    library does, as dictionaries."""
+    buf = []
+    words = []
+    word = None
+    for line in lines:
+        for ch in line + '\n':
+            char = {
+                'id': len(buf),
+                'char': ch,
+                'whitespace': ch == ' ' or ch == '\n',
+                'newline': ch == '\n',
+                'word': None,
+                'visible': True,
+                'typed': None,
+                'correct': False,
+                'rendered': False,
+            }
+            buf.append(char)
+
+            if ch in config.WORD_DELIMITERS or ch == '\n':
+                word = None
+            else:
+                if word is None:
+                    word = {
+                        'id': len(words),
+                        'word': '',
+                        'visible': True,
+                        'touched': False,
+                        'behind': False,
+                        'characters': [],
+                    }
+                    words.append(word)
+                word['word'] += ch
+                word['characters'].append(char['id'])
+                char['word'] = word['id']
+    return (buf, words)
+
+def make_records(lines):
+    """Same as make_dicts(), but makes records."""
+    (buf, words) = make_dicts(lines)
+    return ([CharacterRecord.from_dict(ch) for ch in buf],
+            [WordRecord.from_dict(word) for word in words])
+
+def measure(make, lines):
+    """Returns the number of bytes allocated by make(lines) that are
+    still alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = make(lines)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def main():
+    print('{0:>8} {1:>8} {2:>12} {3:>12} {4:>6}'.format(
+        'size', 'chars', 'dicts (MB)', 'records (MB)', 'ratio'))
+    for (name, size) in SIZES:
+        lines = make_lines(size)
+        chars = sum(len(line) + 1 for line in lines)
+        dicts = measure(make_dicts, lines)
+        records = measure(make_records, lines)
+        print('{0:>8} {1:>8} {2:>12.2f} {3:>12.2f} {4:>6.1f}'.format(
+            name, chars, dicts / 2**20, records / 2**20, dicts / records))
+
+if __name__ == '__main__':
+    main()
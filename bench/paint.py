@@ -0,0 +1,105 @@
+# coding: utf-8
+"""Measures painting a screen of letters the way SpeedTypeCanvas does.
+
+Lays out example.txt into letters like SpeedTypeCanvas._render(), with
+some words typed, some mistyped and some hidden, then paints a
+viewport into an image letter by letter and in runs with GlyphPainter.
+Runs with the offscreen platform plugin, so it needs no display.
+
+"""
+
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import config
+import random
+import time
+from glyphrun import GlyphPainter
+from PyQt5 import QtGui, QtWidgets
+from simplelayout import SimpleLayout
+
+WIDTH = 1000
+HEIGHT = 800
+LINE_SPACING = 30
+REPEAT = 50
+
+def make_letters(font):
+    """Lays out example.txt into letters and their colours."""
+    with open('example.txt') as f:
+        text = f.read()
+
+    # enough text to fill the viewport.
+    text = ' '.join([text] * 10)
+
+    fm = QtGui.QFontMetrics(font)
+    rand = random.Random(0)
+    letters = []
+    y = 0
+    for line in SimpleLayout().layout(text):
+        x = 0
+        for word in line.split(' '):
+            kind = rand.choice(['correct', 'guide', 'underscore',
+                                'incorrect'])
+            for ch in word:
+                letter = '_' if kind == 'underscore' else ch
+                letters.append({
+                    'letter': letter,
+                    'colour': config.COLOURS[kind],
+                    'coord': (x, y),
+                })
+                x += fm.width(ch)
+            letters.append({'letter': ' ', 'colour': 'white',
+                            'coord': (x, y)})
+            x += fm.width(' ')
+        y += LINE_SPACING
+        if y >= HEIGHT:
+            break
+    return letters
+
+def paint_letters(qp, font, letters):
+    """Paints a letter at a time, as SpeedTypeCanvas used to."""
+    fm = QtGui.QFontMetrics(font)
+    qp.setFont(font)
+    for letter in letters:
+        qp.setPen(QtGui.QColor(letter['colour']))
+        (x, y) = letter['coord']
+        qp.drawText(x, y + fm.ascent(), letter['letter'])
+
+def time_paint(paint):
+    """Paints into an image REPEAT times.  Returns the time per paint
+    and the image."""
+    image = QtGui.QImage(WIDTH, HEIGHT, QtGui.QImage.Format_RGB32)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        image.fill(QtGui.QColor(config.COLOURS['background']))
+        qp = QtGui.QPainter(image)
+        paint(qp)
+        qp.end()
+    return ((time.perf_counter() - start) / REPEAT, image)
+
+def count_differences(before, after):
+    """Counts the pixels that differ between the images, e.g. due to
+    anti-aliasing."""
+    return sum(1 for x in range(WIDTH) for y in range(HEIGHT)
+               if before.pixel(x, y) != after.pixel(x, y))
+
+def main():
+    app = QtWidgets.QApplication([])
+    font = QtGui.QFont(config.FONT_FAMILY, 18)
+    font.setKerning(False)
+    font.setStyleStrategy(QtGui.QFont.ForceIntegerMetrics)
+
+    letters = make_letters(font)
+    glyphs = GlyphPainter(font)
+    indices = range(len(letters))
+    runs = glyphs.runs(letters, indices)
+    print('{0} letters, {1} runs'.format(len(letters), len(runs)))
+
+    (single, before) = time_paint(lambda qp: paint_letters(qp, font, letters))
+    (batched, after) = time_paint(lambda qp: glyphs.paint(qp, letters, indices))
+    print('letter by letter: {0:8.2f} ms'.format(single * 1e3))
+    print('in runs: {0:17.2f} ms'.format(batched * 1e3))
+    print('pixels that differ: {0}'.format(count_differences(before, after)))
+
+if __name__ == '__main__':
+    main()
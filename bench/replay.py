@@ -0,0 +1,259 @@
+# coding: utf-8
+"""Replays typing a whole text in the speedtype screen, headless.
+
+Drives SpeedTypeForm with the offscreen platform plugin against a
+fixture database, and types the text of a chapter, or of a chapter the
+length of a book, one key event at a time.  The keystrokes are made up
+with typos, each erased with a backspace before the right key is
+typed, or read from a journal recorded by the session module, e.g.
+session.journal.0.
+
+Reports the latency of each keystroke up to the paint that shows it,
+the stages of handling it as recorded by the canvas, the CPU time, the
+peak resident set size and what the session wrote to the disk, as
+JSON.  Each size is replayed in a process of its own, so that the peak
+memory of one does not hide that of the next.
+
+The fixture database, bench.sdb, is made from example.txt the first
+time.  The session is kept in a temporary directory, away from the
+user's.  libmvpcore and libsdb must be found as when running mvp.
+
+"""
+
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import argparse
+import config
+import json
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from latency import Histogram, LatencyRecorder
+
+FIXTURE_TRANSLATION = 'bench'
+FIXTURE_BOOK = 'Phl'
+
+"""Chapters of the fixture database by size, and the number of verses
+and example verses per verse in each.  The database holds at most 176
+verses a chapter of at most 496 bytes each, so the book size is about
+as long as a chapter can be, some 80000 characters."""
+SIZES = {
+    'chapter': (1, 30, 1),
+    'book': (2, 176, 3),
+}
+
+"""Chance of a typo at each character of the synthetic keystrokes."""
+TYPO_RATE = 0.03
+
+WIDTH = 1000
+HEIGHT = 800
+
+def example_verses():
+    """Splits the example passage into verses."""
+    with open('example.txt') as f:
+        text = f.read().split(']', 1)[1].strip()
+    return [verse.strip() for verse in re.split(r'\d+ ', text)
+            if verse.strip() != '']
+
+def make_fixture():
+    """Makes the fixture database unless it is there already."""
+    import model
+    from sdb.sdb import Sdb
+
+    config.translation = FIXTURE_TRANSLATION
+    path = FIXTURE_TRANSLATION + config.DB_EXT
+    if os.path.exists(path):
+        return
+
+    Sdb.create(path)
+    with Sdb(path) as sdb:
+        sdb.create_table('verse.mjson')
+
+    examples = example_verses()
+    for (chapter, verses, per_verse) in SIZES.values():
+        for verseno in range(1, verses + 1):
+            first = (verseno - 1) * per_verse
+            text = ' '.join(examples[i % len(examples)]
+                            for i in range(first, first + per_verse))
+            model.verse.insert(FIXTURE_BOOK, chapter, verseno, text)
+
+def synthetic_keystrokes(chars, seed=0):
+    """Makes up the keystrokes typing the text in chars, the
+    characters_array() of the speedtype state, with typos.
+
+    Returns a list of records like the journal's, ('t', pos, char)
+    and ('b', pos).  The last character is left untyped, which would
+    finish the session and wait for the user to choose what next.
+
+    """
+    rand = random.Random(seed)
+    records = []
+    for pos in range(len(chars) - 1):
+        ch = chars[pos]
+        char = ' ' if ch['whitespace'] or ch['newline'] \
+            else chr(ch['character'])
+        if rand.random() < TYPO_RATE:
+            records.append(('t', pos, chr(ord(char) ^ 1)))
+            records.append(('b', pos))
+        records.append(('t', pos, char))
+    return records
+
+def read_keystrokes(path):
+    """Reads the keystrokes from a journal written by session.Journal."""
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 3 and fields[0] == 't':
+                records.append(('t', int(fields[1]), chr(int(fields[2]))))
+            elif len(fields) == 2 and fields[0] == 'b':
+                records.append(('b', int(fields[1])))
+    return records
+
+def bytes_written():
+    """Returns the bytes the process has written, where the platform
+    tells."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def peak_rss():
+    """Returns the peak resident set size in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def replay(size, journal, workdir):
+    """Loads the chapter of the size in the speedtype screen and
+    replays the keystrokes.  Returns the results."""
+    import session
+    import speedtype
+    from PyQt5 import QtCore, QtGui, QtWidgets
+
+    config.translation = FIXTURE_TRANSLATION
+    session.SESSION_FILE = os.path.join(workdir, 'session.snapshot')
+    session.LEGACY_SESSION_FILE = os.path.join(workdir, 'session.json')
+    session.JOURNAL_PREFIX = os.path.join(workdir, 'session.journal.')
+
+    (chapter, _, _) = SIZES[size]
+    sess = session.init()
+    for loc in sess['range'].values():
+        loc['translation'] = config.translation
+        loc['book'] = FIXTURE_BOOK
+        loc['chapter'] = chapter
+    session.store(sess)
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    start = time.perf_counter()
+    form = speedtype.SpeedTypeForm()
+    form.resize(WIDTH, HEIGHT)
+    form.show()
+    canvas = form.canvas
+    while canvas.loader is not None:
+        app.processEvents(QtCore.QEventLoop.AllEvents |
+                          QtCore.QEventLoop.WaitForMoreEvents)
+    app.processEvents()
+    load = time.perf_counter() - start
+
+    if journal is None:
+        # the records of a virtual canvas are only kept near the
+        # viewport, so the text is read from the native state.
+        records = synthetic_keystrokes(canvas.state.characters_array())
+    else:
+        records = read_keystrokes(journal)
+
+    canvas.latency = LatencyRecorder()
+    keystrokes = Histogram()
+    written = bytes_written()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    for record in records:
+        if record[0] == 't':
+            event = QtGui.QKeyEvent(QtCore.QEvent.KeyPress, 0,
+                                    QtCore.Qt.NoModifier, record[2])
+        else:
+            event = QtGui.QKeyEvent(QtCore.QEvent.KeyPress,
+                                    QtCore.Qt.Key_Backspace,
+                                    QtCore.Qt.NoModifier)
+        key_start = time.perf_counter()
+        app.sendEvent(canvas, event)
+        app.processEvents()
+        keystrokes.record((time.perf_counter() - key_start) * 1e6)
+
+    canvas.persist_on_exit()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    if written is not None:
+        written = bytes_written() - written
+
+    return {
+        'size': size,
+        'characters': len(canvas.state.buf()),
+        'keystrokes': len(records),
+        'load_ms': round(load * 1e3, 1),
+        'replay_s': round(elapsed, 3),
+        'cpu_s': round(cpu, 3),
+        'peak_rss_bytes': peak_rss(),
+        'keystroke_us': keystrokes.summary(),
+        'stages_us': canvas.latency.summary(),
+        'persistence': dict(session.writer_stats(),
+                            journal_records=len(records),
+                            bytes_written=written),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-s', '--size', choices=list(SIZES), action='append',
+                        help='size of the text to type, all by default')
+    parser.add_argument('-j', '--journal',
+                        help='journal to replay instead of made up typing')
+    parser.add_argument('-o', '--output',
+                        help='file to write the results to, instead of '
+                             'standard output')
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.child:
+        with tempfile.TemporaryDirectory() as workdir:
+            result = replay(opts.size[0], opts.journal, workdir)
+        json.dump(result, sys.stdout)
+        return
+
+    make_fixture()
+    results = []
+    for size in opts.size or list(SIZES):
+        args = [sys.executable, '-m', 'bench.replay', '--child',
+                '--size', size]
+        if opts.journal is not None:
+            args += ['--journal', opts.journal]
+        child = subprocess.run(args, stdout=subprocess.PIPE, check=True,
+                               text=True)
+        # the result is the last line, after anything the application
+        # printed.
+        results.append(json.loads(child.stdout.splitlines()[-1]))
+
+    report = {
+        'platform': sys.platform,
+        'python': sys.version.split()[0],
+        'virtual_canvas': config.VIRTUAL_CANVAS,
+        'results': results,
+    }
+    if opts.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(opts.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# coding: utf-8
+"""Compares the binary session snapshot with the JSON session file.
+
+Makes up the progress through a text of each size, half typed with a
+few mistakes and some words hidden.  The progress is stored and loaded
+as session.json used to hold it, and as a snapshot.  File sizes and
+times are printed.
+
+Loading a snapshot also lays out the text and processes it in the
+native state again, which is not timed here.  bench.speedtype_state
+times that part.
+
+"""
+
+import json
+import numpy as np
+import os
+import random
+import session
+import snapshot
+import tempfile
+import time
+
+SIZES = [3000, 30000, 300000]
+
+"""Fraction of the characters typed, and of those, mistyped."""
+TYPED = 0.5
+MISTYPED = 0.02
+
+"""Fraction of the words hidden."""
+HIDDEN = 0.4
+
+def make_progress(size):
+    """Makes up the progress through size characters of text, as
+    records and as columns."""
+    rand = random.Random(size)
+    with open('example.txt') as f:
+        text = f.read().replace('\n', ' ')
+    text = (text * (size // len(text) + 1))[:size]
+
+    buf = []
+    words = []
+    typed_until = int(size * TYPED)
+    for (i, char) in enumerate(text):
+        whitespace = char.isspace()
+        if not whitespace and (i == 0 or text[i - 1].isspace()):
+            words.append({'id': len(words), 'word': '', 'characters': [],
+                          'visible': rand.random() >= HIDDEN,
+                          'touched': i < typed_until,
+                          'behind': i < typed_until})
+        word = None if whitespace else words[-1]['id']
+        if word is not None:
+            words[word]['characters'].append(i)
+            words[word]['word'] += char
+
+        typed = None
+        if i < typed_until:
+            typed = 'x' if rand.random() < MISTYPED else char
+        buf.append({'id': i, 'char': char, 'word': word, 'typed': typed,
+                    'whitespace': whitespace, 'newline': False,
+                    'visible': word is None or words[word]['visible'],
+                    'correct': typed == char, 'rendered': False})
+
+    columns = {
+        'visible': np.array([ch['visible'] for ch in buf]),
+        'has_typed': np.array([ch['typed'] is not None for ch in buf]),
+        'typed': np.array([ord(ch['typed'] or '\0') for ch in buf],
+                          np.uint32),
+        'correct': np.array([ch['correct'] for ch in buf]),
+        'word_visible': np.array([w['visible'] for w in words]),
+        'touched': np.array([w['touched'] for w in words]),
+        'behind': np.array([w['behind'] for w in words]),
+    }
+    return (buf, words, columns)
+
+def make_session(progress):
+    sess = session.init()
+    sess['progress'] = progress
+    return sess
+
+def store_json(sess, path):
+    with open(path, 'w') as f:
+        json.dump(sess, f, indent=2)
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def store_snapshot(sess, path):
+    with open(path, 'wb') as f:
+        f.write(snapshot.dumps(sess))
+
+def load_snapshot(path):
+    with open(path, 'rb') as f:
+        return snapshot.loads(f.read())
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start, result)
+
+def main():
+    print('{0:>8} {1:>10} {2:>9} {3:>9} {4:>10} {5:>9} {6:>9}'.format(
+        'chars', 'json size', 'store ms', 'load ms',
+        'snap size', 'store ms', 'load ms'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'session.json')
+        snapshot_path = os.path.join(tmp, 'session.snapshot')
+
+        for size in SIZES:
+            (buf, words, columns) = make_progress(size)
+            caret = {'charpos': int(size * TYPED), 'pos': [0, 0],
+                     'visible': True, 'width': 1, 'eobuf': size - 1,
+                     'buflen': size}
+
+            legacy = make_session({'buf': buf, 'words': words,
+                                   'sentences': [], 'caret': caret,
+                                   'title': 'bench'})
+            (json_store, _) = timed(store_json, legacy, json_path)
+            (json_load, _) = timed(load_json, json_path)
+
+            binary = make_session({'caret': caret, 'title': 'bench',
+                                   'layout': 'bench', 'loaded': 0,
+                                   'missing': False, 'columns': columns})
+            (snap_store, _) = timed(store_snapshot, binary, snapshot_path)
+            (snap_load, loaded) = timed(load_snapshot, snapshot_path)
+
+            restored = loaded['progress']['columns']
+            snapshot.fill_typed(restored, np.array([ord(ch['char'])
+                                                    for ch in buf]))
+            for name in columns:
+                assert (restored[name] == columns[name]).all(), name
+
+            print('{0:>8} {1:>10} {2:>9.2f} {3:>9.2f} {4:>10} {5:>9.2f} '
+                  '{6:>9.2f}'.format(
+                      size, os.path.getsize(json_path), json_store * 1e3,
+                      json_load * 1e3, os.path.getsize(snapshot_path),
+                      snap_store * 1e3, snap_load * 1e3))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# coding: utf-8
+"""Measures how loading text into bridge.speedtype.State scales.
+
+Feeds one chapter, then a handful of chapters, then a whole book's
+worth of lines into a fresh State, one line at a time and then in a
+single batch.  The time per line stays flat if loading scales linearly
+with the length of the text.
+
+libmvpcore must be found in LD_LIBRARY_PATH.
+
+"""
+
+import time
+from bridge.speedtype import State
+from graphlayout import GraphLayout
+
+"""Number of times the example passage is repeated to make up a
+chapter of a typical length."""
+PASSAGES_PER_CHAPTER = 5
+
+"""Sizes of the text to load in number of chapters.  The largest is
+about the size of Isaiah."""
+CHAPTER_COUNTS = [1, 4, 16, 66]
+
+def example_lines():
+    """Lays out the example passage into lines."""
+    with open('example.txt') as f:
+        text = f.read().split(']', 1)[1].strip()
+    return GraphLayout().layout(text)
+
+def load(lines):
+    """Loads the lines into a new State one at a time and returns the
+    elapsed time."""
+    state = State()
+    start = time.perf_counter()
+    for line in lines:
+        state.process_line(line)
+    elapsed = time.perf_counter() - start
+    assert len(state.sentences()) == len(lines)
+    return elapsed
+
+def load_batch(lines):
+    """Loads the lines into a new State in one call and returns the
+    elapsed time."""
+    state = State()
+    start = time.perf_counter()
+    state.process_lines(lines)
+    elapsed = time.perf_counter() - start
+    assert len(state.sentences()) == len(lines)
+    return elapsed
+
+def main():
+    chapter = example_lines() * PASSAGES_PER_CHAPTER
+
+    print('{0:>8} {1:>8} {2:>10} {3:>14} {4:>14}'.format(
+        'chapters', 'lines', 'total (s)', 'per line (us)', 'batched (us)'))
+    for count in CHAPTER_COUNTS:
+        lines = chapter * count
+        elapsed = load(lines)
+        batched = load_batch(lines)
+        print('{0:>8} {1:>8} {2:>10.3f} {3:>14.1f} {4:>14.1f}'.format(
+            count, len(lines), elapsed, elapsed / len(lines) * 1e6,
+            batched / len(lines) * 1e6))
+
+if __name__ == '__main__':
+    main()
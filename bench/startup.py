@@ -0,0 +1,113 @@
+# coding: utf-8
+"""Reports how long the application takes to paint its first window.
+
+Starts the application in a child process under python -X importtime,
+with the offscreen platform plugin, and times it from launch until the
+first paint of the initial form.  The modules that took longest to
+import are listed from the importtime output.
+
+Each run is made twice: eagerly, as the application used to start, by
+importing every form up front and parsing the .ui files with uic at
+runtime, and lazily, as it starts now.
+
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+"""Number of modules to list, by cumulative import time."""
+TOP_MODULES = 10
+
+def child(eager, launched):
+    """Starts the application and exits at its first paint, printing
+    the time since launch in seconds."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    import config
+    if eager:
+        config.UI_CACHE_DIR = None
+        import dataentry
+        import flashcard
+        import speedtype
+
+    import screen
+    from PyQt5 import QtCore, QtWidgets
+
+    class FirstPaint(QtCore.QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QtCore.QEvent.Paint and \
+               isinstance(obj, QtWidgets.QWidget) and \
+               obj.window() is screen.form.gui:
+                print('first paint {0:.6f}'.format(time.time() - launched))
+                sys.stdout.flush()
+                os._exit(0)
+            return False
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    first_paint = FirstPaint()
+    app.installEventFilter(first_paint)
+    screen.init_screens()
+    app.exec()
+
+def parse_importtime(stderr):
+    """Returns the total import time in microseconds and the top level
+    imports as (cumulative microseconds, module) tuples."""
+    total = 0
+    toplevel = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        (self_us, cumulative, name) = line[len('import time:'):].split('|')
+        total += int(self_us)
+        if not name[1:].startswith(' '):
+            toplevel.append((int(cumulative), name.strip()))
+    return (total, sorted(toplevel, reverse=True))
+
+def run(eager):
+    """Runs the child process.  Returns the time to first paint in
+    seconds, the total import time in microseconds and the top level
+    imports."""
+    args = [sys.executable, '-X', 'importtime', '-m', 'bench.startup',
+            '--child']
+    if eager:
+        args.append('--eager')
+    launched = time.time()
+    args.append(repr(launched))
+
+    result = subprocess.run(args, capture_output=True, text=True)
+    first_paint = None
+    for line in result.stdout.splitlines():
+        if line.startswith('first paint '):
+            first_paint = float(line.split()[-1])
+    if first_paint is None:
+        sys.exit('the application did not paint:\n' + result.stderr)
+
+    (total, toplevel) = parse_importtime(result.stderr)
+    return (first_paint, total, toplevel)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--eager', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('launched', nargs='?', type=float,
+                        help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.child:
+        child(opts.eager, opts.launched)
+        return
+
+    for (label, eager) in [('eager', True), ('lazy', False)]:
+        (first_paint, total, toplevel) = run(eager)
+        print('{0}: first paint {1:.1f} ms, imports {2:.1f} ms'.format(
+            label, first_paint * 1e3, total / 1e3))
+        for (cumulative, name) in toplevel[:TOP_MODULES]:
+            print('  {0:>9.1f} ms  {1}'.format(cumulative / 1e3, name))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+# coding: utf-8
+"""Times the components of the application against a synthetic corpus.
+
+Each benchmark times an operation over part of the corpus generated by
+bench.corpus, and reports the time per operation, the best of REPEATS
+runs.  The results can be saved as a baseline, and later runs compared
+against it:
+
+    python3 -m bench.suite --save
+    python3 -m bench.suite --compare
+
+Comparing lists the benchmarks that slowed down by more than the
+threshold, and exits with a non-zero status if any did.  Baselines
+only compare on the machine they were saved on.
+
+Benchmarks that need libmvpcore, or the corpus written into a database
+with python3 -m bench.corpus --database corpus, are skipped if it is
+not there.
+
+"""
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from bench import corpus
+
+DEFAULT_BASELINE = os.path.join('bench', 'baseline.json')
+
+"""Slowdown relative to the baseline that is flagged."""
+DEFAULT_THRESHOLD = 0.15
+
+"""Number of runs of each benchmark, and the least time a run takes.
+A run repeats the operations until it takes at least MIN_RUN_TIME."""
+REPEATS = 5
+MIN_RUN_TIME = 0.2
+
+"""Translation of the database holding the corpus."""
+CORPUS_TRANSLATION = 'corpus'
+
+"""Chapters the benchmarks work on: a short one, a typical one, the
+longest, and those of an epistle with long sentences."""
+SAMPLE_CHAPTERS = [('Phm', 1), ('Gen', 1), ('Psa', 119), ('Eph', 1),
+                   ('Eph', 2), ('Eph', 3), ('Eph', 4), ('Eph', 5),
+                   ('Eph', 6)]
+
+"""Size in characters of the session stored and loaded, about that of
+Isaiah."""
+SESSION_SIZE = 180000
+
+BENCHMARKS = []
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run here."""
+    pass
+
+def benchmark(fn):
+    """Registers the benchmark.  It is called with the corpus, and
+    returns the operation to time and the number of operations it
+    does."""
+    BENCHMARKS.append(fn)
+    return fn
+
+def sample_chapters(records):
+    return [corpus.find_chapter(records, book, chapter)
+            for (book, chapter) in SAMPLE_CHAPTERS]
+
+def sample_sentences(records):
+    """Returns the text of each sentence of the sample chapters."""
+    from sentence import sentences_cons2
+    return [sentence['text'] for chapter in sample_chapters(records)
+            for sentence in sentences_cons2(chapter)[0]]
+
+def libmvpcore():
+    """Imports the native library, or skips the benchmark if it cannot
+    be loaded."""
+    try:
+        from bridge.libmvpcore import libmvpcore
+    except OSError as e:
+        raise Skip(str(e))
+    return libmvpcore
+
+@benchmark
+def sentences_cons2(records):
+    from sentence import sentences_cons2
+    chapters = sample_chapters(records)
+    return (lambda: [sentences_cons2(chapter) for chapter in chapters],
+            len(chapters))
+
+@benchmark
+def simplelayout(records):
+    from simplelayout import SimpleLayout
+    texts = sample_sentences(records)
+    engine = SimpleLayout()
+    return (lambda: [engine.layout(text) for text in texts], len(texts))
+
+@benchmark
+def graphlayout(records):
+    from graphlayout import GraphLayout
+    texts = sample_sentences(records)
+    engine = GraphLayout()
+    return (lambda: [engine.layout(text) for text in texts], len(texts))
+
+@benchmark
+def native_graphlayout(records):
+    libmvpcore()
+    from bridge.graphlayout import layout
+    texts = sample_sentences(records)
+    return (lambda: [layout(text) for text in texts], len(texts))
+
+@benchmark
+def process_line(records):
+    libmvpcore()
+    from bridge.speedtype import State
+    from graphlayout import GraphLayout
+    engine = GraphLayout()
+    lines = [line for text in sample_sentences(records)
+             for line in engine.layout(text)]
+
+    def process():
+        state = State()
+        for line in lines:
+            state.process_line(line)
+    return (process, len(lines))
+
+@benchmark
+def find_by_book_and_chapter(records):
+    import config
+    libmvpcore()
+    if not os.path.exists(CORPUS_TRANSLATION + config.DB_EXT):
+        raise Skip('no corpus database, see bench.corpus')
+
+    from bridge import verse
+    return (lambda: [verse.find_by_book_and_chapter(CORPUS_TRANSLATION,
+                                                    book, chapter)
+                     for (book, chapter) in SAMPLE_CHAPTERS],
+            len(SAMPLE_CHAPTERS))
+
+@benchmark
+def session_store_load(records):
+    import session
+    from bench.snapshot import make_progress
+
+    workdir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, workdir, True)
+    session.SESSION_FILE = os.path.join(workdir, 'session.snapshot')
+    session.LEGACY_SESSION_FILE = os.path.join(workdir, 'session.json')
+    session.JOURNAL_PREFIX = os.path.join(workdir, 'session.journal.')
+
+    (_, _, columns) = make_progress(SESSION_SIZE)
+    sess = session.init()
+    sess['progress'] = {'caret': {'charpos': 0}, 'title': 'bench',
+                        'layout': 'bench', 'loaded': 0, 'missing': False,
+                        'columns': columns}
+
+    def store_load():
+        session.store(sess)
+        session.load()
+    return (store_load, 1)
+
+@benchmark
+def ctypes_call(records):
+    library = libmvpcore()
+    return (lambda: library.session_get_message(0), 1)
+
+def measure(operation, count):
+    """Returns the best time per operation in seconds."""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_RUN_TIME:
+            break
+        calls *= 2
+
+    best = elapsed
+    for _ in range(REPEATS - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        best = min(best, time.perf_counter() - start)
+    return best / calls / count
+
+def run(names):
+    """Runs the benchmarks.  Returns the time per operation of each,
+    and why the others were skipped."""
+    records = corpus.generate()
+    results = {}
+    skipped = {}
+    for fn in BENCHMARKS:
+        if names and fn.__name__ not in names:
+            continue
+        try:
+            (operation, count) = fn(records)
+        except Skip as e:
+            skipped[fn.__name__] = str(e)
+            continue
+        results[fn.__name__] = measure(operation, count)
+        print('{0:<26}{1:>12.2f} us'.format(fn.__name__,
+                                            results[fn.__name__] * 1e6))
+    for (name, reason) in skipped.items():
+        print('{0:<26}{1:>12}  {2}'.format(name, 'skipped', reason))
+    return results
+
+def compare(results, baseline, threshold):
+    """Prints the change of each benchmark from the baseline.  Returns
+    the names of those that slowed down beyond the threshold."""
+    slower = []
+    for (name, seconds) in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ''
+        if change > threshold:
+            slower.append(name)
+            flag = '  SLOWER'
+        print('{0:<26}{1:>+11.1f}%{2}'.format(name, change * 100, flag))
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, all by default')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='file the baseline is saved in')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the baseline')
+    parser.add_argument('--compare', action='store_true',
+                        help='compare the results with the baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown to flag, e.g. 0.15 for 15%%')
+    opts = parser.parse_args()
+
+    results = run(opts.names)
+
+    if opts.compare:
+        with open(opts.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline['machine'] != platform.node():
+            print('the baseline was saved on {0}'.format(baseline['machine']))
+        print()
+        slower = compare(results, baseline['results'], opts.threshold)
+        if slower:
+            sys.exit('{0} benchmarks slowed down by more than {1:.0f}%'.format(
+                len(slower), opts.threshold * 100))
+
+    if opts.save:
+        with open(opts.baseline, 'w') as f:
+            json.dump({'machine': platform.node(),
+                       'python': platform.python_version(),
+                       'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+from bridge.libmvpcore import libmvpcore
+import ctypes
+
+class Line(ctypes.Structure):
+    """A line of the layout as the byte offset and length in the
+    text."""
+    _fields_ = [('index', ctypes.c_size_t),
+                ('len', ctypes.c_size_t)]
+
+def layout(text):
+    """Invokes graphlayout_layout() in the libmvpcore.  Returns the
+    lines like GraphLayout.layout()."""
+    encoded = bytes(text, 'utf8')
+
+    # a line holds at least a word.
+    capacity = encoded.count(b' ') + 1
+    while True:
+        lines = (Line * capacity)()
+        count = ctypes.c_size_t(capacity)
+        ret = libmvpcore.graphlayout_layout(ctypes.c_char_p(encoded),
+                                            ctypes.byref(lines),
+                                            ctypes.byref(count))
+        if ret == 0:
+            break
+        capacity *= 2
+
+    return [encoded[line.index:line.index + line.len].decode('utf8')
+            for line in lines[:count.value]]
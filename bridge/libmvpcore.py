@@ -14,12 +14,19 @@ EXTFNS = [["session_create", [ctypes.c_void_p], ctypes.c_int],
           ["session_list_sessions", [ctypes.c_char_p, POINTER(ctypes.c_size_t)], ctypes.c_int],
           ["session_delete", [ctypes.c_void_p], ctypes.c_int],
           ["session_get_message", [ctypes.c_int], ctypes.c_char_p],
-          ["verse_find_all", [ctypes.c_char_p, ctypes.c_void_p], ctypes.c_int],
+          ["verse_cursor_open", [ctypes.c_char_p, POINTER(ctypes.c_void_p)], ctypes.c_int],
+          ["verse_cursor_next", [ctypes.c_void_p, ctypes.c_void_p, POINTER(ctypes.c_size_t), ctypes.c_void_p, POINTER(ctypes.c_size_t)], ctypes.c_int],
+          ["verse_cursor_close", [ctypes.c_void_p], None],
           ["verse_find_by_book_and_chapter", [ctypes.c_char_p, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_short], ctypes.c_int],
           ["speedtype_new", None, ctypes.c_void_p],
           ["speedtype_delete", [ctypes.c_void_p], None],
           ["speedtype_process_line", [ctypes.c_void_p, ctypes.c_char_p], ctypes.c_int],
-          ["speedtype_apply_level", [ctypes.c_void_p, ctypes.c_byte], None],
+          ["speedtype_process_lines", [ctypes.c_void_p, POINTER(ctypes.c_char_p), ctypes.c_size_t], ctypes.c_int],
+          ["speedtype_apply_level", [ctypes.c_void_p, ctypes.c_ubyte], ctypes.c_int],
+          ["speedtype_apply_level_from", [ctypes.c_void_p, ctypes.c_ubyte, ctypes.c_size_t], ctypes.c_int],
+          ["speedtype_type_char", [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint32, ctypes.c_void_p], ctypes.c_int],
+          ["speedtype_backspace", [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p], ctypes.c_int],
+          ["graphlayout_layout", [ctypes.c_char_p, ctypes.c_void_p, POINTER(ctypes.c_size_t)], ctypes.c_int],
 ]
 
 class Libmvpcore:
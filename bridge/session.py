@@ -2,8 +2,13 @@
 """Acts as a bridge between the GUI and the session backend."""
 
 from enum import Enum
-from libmvpcore import libmvpcore
 import ctypes
+import hashlib
+import json
+import os
+import snapshot
+import struct
+import sys
 
 ######################################################################
 # Error Code and Types
@@ -92,6 +97,19 @@ def _map_error(errorkind):
 # Data Structures
 ######################################################################
 
+class Location(ctypes.Structure):
+    """creates a struct to point to a location in the Bible
+
+    The order of the fields and their types must match the
+    corresponding data structure in the core library.
+
+    """
+    _fields_ = [('translation', ctypes.c_ubyte * 8),
+                ('book', ctypes.c_ubyte * 8),
+                ('chapter', ctypes.c_short),
+                ('sentence', ctypes.c_short),
+                ('verse', ctypes.c_short)]
+
 class Session(ctypes.Structure):
     """Represents a speed typing session.
 
@@ -104,21 +122,190 @@ class Session(ctypes.Structure):
                 ('level', ctypes.c_ubyte),
                 ('strategy', ctypes.c_ubyte)]
 
-class Location(ctypes.Structure):
-    """creates a struct to point to a location in the Bible
+######################################################################
+# Session Store
+######################################################################
 
-    The order of the fields and their types must match the
-    corresponding data structure in the core library.
+APP_DIR = 'mvp-speedtype'
+STORE_DIR = 'sessions'
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+
+class SessionStore:
+    """Keeps any number of named sessions.
+
+    A small index holds the metadata of every session: its name,
+    range, level and strategy.  The progress of each session is kept in
+    a file of its own, encoded by the snapshot module, and is only read
+    when the session is opened.  Listing, creating and deleting
+    sessions touch the index alone.
+
+    Sessions are dictionaries like those made by session.init().
 
     """
-    _fields_ = [('translation', ctypes.c_ubyte * 8),
-                ('book', ctypes.c_ubyte * 8),
-                ('chapter', ctypes.c_short),
-                ('sentence', ctypes.c_short),
-                ('verse', ctypes.c_short)]
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(_data_dir(), APP_DIR, STORE_DIR)
+        self.path = path
+        self._index = None
+        self._index_mtime = None
+
+    def list_sessions(self):
+        """Returns the metadata of the sessions, sorted by name."""
+        sessions = self._read_index()
+        return [_metadata(sessions[name]) for name in sorted(sessions)]
+
+    def create(self, session):
+        """Adds a new session.  Raises SessionExists if there is a
+        session by the same name."""
+        sessions = self._read_index()
+        if session['name'] in sessions:
+            raise SessionExists(session['name'])
+
+        entry = _metadata(session)
+        entry['progress'] = None
+        sessions[session['name']] = entry
+        self._write_index(sessions)
+
+        if session.get('progress') is not None:
+            self.save(session)
+
+    def open(self, name):
+        """Returns the session with its progress.  Raises KeyError if
+        there is no such session, and SessionCorruptData if its
+        progress is missing or cannot be read.
+
+        The progress is decoded as session.load() decodes it, so the
+        typed column only holds the mismatches until fill_typed() is
+        called with the text, as restoring the progress does.
+
+        """
+        entry = self._read_index()[name]
+        if entry['progress'] is None:
+            session = _metadata(entry)
+            session['progress'] = None
+            return session
+
+        try:
+            with open(os.path.join(self.path, entry['progress']), 'rb') as f:
+                session = snapshot.loads(f.read())
+        except FileNotFoundError:
+            raise SessionCorruptData('progress of {0} is missing'.format(name))
+        except (snapshot.SnapshotError, struct.error, ValueError, KeyError,
+                IndexError) as e:
+            raise SessionCorruptData(str(e))
+        session.update(_metadata(entry))
+        return session
+
+    def save(self, session):
+        """Stores the metadata and progress of an existing session."""
+        sessions = self._read_index()
+        entry = sessions[session['name']]
+        entry.update(_metadata(session))
+
+        if session.get('progress') is not None:
+            entry['progress'] = _progress_file(session['name'])
+            _write_atomically(os.path.join(self.path, entry['progress']),
+                              snapshot.dumps(session))
+        self._write_index(sessions)
+
+    def delete(self, name):
+        """Removes the session and its progress.  Raises KeyError if
+        there is no such session."""
+        sessions = self._read_index()
+        entry = sessions.pop(name)
+        self._write_index(sessions)
+
+        if entry['progress'] is not None:
+            try:
+                os.remove(os.path.join(self.path, entry['progress']))
+            except FileNotFoundError:
+                pass
+
+    def _read_index(self):
+        """Reads the index, unless it has not changed since it was last
+        read."""
+        path = os.path.join(self.path, INDEX_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._index = {}
+            self._index_mtime = None
+            return self._index
+
+        if self._index is None or mtime != self._index_mtime:
+            with open(path, 'r') as f:
+                try:
+                    index = json.load(f)
+                except json.decoder.JSONDecodeError as e:
+                    raise SessionCorruptData(str(e))
+            if index.get('version') != INDEX_VERSION:
+                raise SessionCorruptData('unsupported session index version')
+            self._index = index['sessions']
+            self._index_mtime = mtime
+        return self._index
+
+    def _write_index(self, sessions):
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, INDEX_FILE)
+        index = {'version': INDEX_VERSION, 'sessions': sessions}
+        _write_atomically(path, json.dumps(index).encode('utf8'))
+        self._index = sessions
+        self._index_mtime = os.stat(path).st_mtime_ns
+
+_store = None
+
+def get_store():
+    """Returns the session store in the application data directory."""
+    global _store
+    if _store is None:
+        _store = SessionStore()
+    return _store
 
 def list_sessions():
-    pass
+    """Lists the metadata of the stored sessions without loading their
+    progress."""
+    return get_store().list_sessions()
+
+def create_session(session):
+    get_store().create(session)
+
+def open_session(name):
+    return get_store().open(name)
+
+def save_session(session):
+    get_store().save(session)
+
+def delete_session(name):
+    get_store().delete(name)
+
+def _metadata(session):
+    return {key: session[key] for key in ['name', 'range', 'level', 'strategy']}
+
+def _progress_file(name):
+    """Names the progress file after a digest of the session name, which
+    may contain any characters."""
+    return hashlib.sha1(name.encode('utf8')).hexdigest()[:16] + '.snapshot'
+
+def _write_atomically(path, data):
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+def _data_dir():
+    """Returns the platform's data directory, as the core library finds
+    it."""
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Application Support')
+    elif sys.platform == 'win32':
+        return os.environ['APPDATA']
+    else:
+        return os.environ.get('XDG_DATA_HOME') or \
+            os.path.expanduser('~/.local/share')
 
 def get_message(error_code):
+    from bridge.libmvpcore import libmvpcore
     libmvpcore.session_get_message(error_code)
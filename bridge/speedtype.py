@@ -1,3 +1,4 @@
+from array import array
 from ctypes import *
 from bridge.libmvpcore import libmvpcore
 import ctypes
@@ -34,6 +35,24 @@ class Sentence(ctypes.Structure):
                 ('words_ptr', POINTER(c_size_t)),
     ]
 
+class Dirty(ctypes.Structure):
+    """Describes what a keystroke changed in the state.
+
+    character is the index of the character that changed.  If it
+    belongs to a word, has_word is set, and touched and behind are
+    the state of the word after the keystroke.  complete is set when
+    the last character of the text has been typed.
+
+    """
+    _fields_ = [('character', c_size_t),
+                ('has_word', c_uint32), # boolean
+                ('word', c_size_t),
+                ('touched', c_uint32), # boolean
+                ('behind', c_uint32), # boolean
+                ('word_changed', c_uint32), # boolean
+                ('complete', c_uint32), # boolean
+    ]
+
 class StateRaw(ctypes.Structure):
     """Represents the state of the speedtype app.
 
@@ -54,9 +73,22 @@ class SpeedtypeError(Exception):
         self.code = code
 
 class State:
-    """Embodies the state and methods of the speedtype module."""
-    def __init__(self):
+    """Embodies the state and methods of the speedtype module.
+
+    By default the native state is converted into CharacterRecord and
+    WordRecord objects as it grows, accessed through buf(), words()
+    and sentences().  If idiomatic is False, the conversion is skipped
+    and the native state is only accessed as NumPy arrays through
+    characters_array(), words_array() and word_characters().
+
+    """
+    def __init__(self, idiomatic=True):
         self._state = libmvpcore.speedtype_new()
+        self._idiomatic = idiomatic
+        self._buf = []
+        self._words = []
+        self._sentences = []
+        self._reset_index()
 
     def __del__(self):
         libmvpcore.speedtype_delete(self._state)
@@ -67,75 +99,382 @@ class State:
         if retcode != 0:
             raise SpeedtypeError(retcode)
 
-        self._enable_idiomatic_access()
+        if self._idiomatic:
+            self._enable_idiomatic_access()
+
+    def process_lines(self, lines):
+        """Processes the given lines in a single call into the core
+        library."""
+        self._process_lines(lines)
+
+        if self._idiomatic:
+            self._enable_idiomatic_access()
+
+    def _process_lines(self, lines):
+        lines = [bytes(line, 'utf8') for line in lines]
+        retcode = libmvpcore.speedtype_process_lines(
+            self._state, (c_char_p * len(lines))(*lines), len(lines))
+        if retcode != 0:
+            raise SpeedtypeError(retcode)
+
+    def restore(self, buf, words, sentences):
+        """Restores the state persisted from buf(), words() and
+        sentences().
+
+        The characters and words are given as dictionaries, as
+        returned by to_dict() of the records.  The native state is
+        rebuilt by processing the lines found in buf again.  The
+        progress is then copied over from the persisted characters and
+        words.
+
+        """
+        lines = []
+        line = []
+        for ch in buf:
+            if ch['newline']:
+                lines.append(''.join(line))
+                line = []
+            else:
+                line.append(ch['char'])
+        self._process_lines(lines)
+
+        state = self.get_state()
+        assert state.buffer_len == len(buf) and state.words_len == len(words)
+
+        for (i, ch) in enumerate(buf):
+            raw = state.buffer_ptr[i]
+            raw.visible = ch['visible']
+            raw.has_typed = ch['typed'] is not None
+            if ch['typed'] is not None:
+                raw.typed = ord(ch['typed'])
+            raw.correct = ch['correct']
+
+        self._buf = [CharacterRecord.from_dict(ch) for ch in buf]
+        self._words = [WordRecord.from_dict(word) for word in words]
+        self._sentences = sentences
+        self._reset_index()
+        self._sync_words_to_native()
+
+    def progress_columns(self):
+        """Returns the progress of the characters and words as columns.
+
+        Returns a dict of NumPy arrays copied out of the native state:
+        visible, has_typed, typed and correct for the characters, and
+        word_visible, touched and behind for the words.  The rest of
+        the state can be worked out from the text.
+
+        """
+        chars = self.characters_array()
+        words = self.words_array()
+        return {
+            'visible': chars['visible'] != 0,
+            'has_typed': chars['has_typed'] != 0,
+            'typed': chars['typed'].copy(),
+            'correct': chars['correct'] != 0,
+            'word_visible': words['visible'] != 0,
+            'touched': words['touched'] != 0,
+            'behind': words['behind'] != 0,
+        }
+
+    def restore_columns(self, columns):
+        """Restores the progress returned by progress_columns().
+
+        The text must have been processed already, e.g. by laying out
+        the same lines again.  The columns are written into the native
+        state, and the records are converted from it afresh.
+
+        """
+        chars = self.characters_array()
+        words = self.words_array()
+        assert len(chars) == len(columns['visible']) and \
+            len(words) == len(columns['word_visible'])
+
+        chars['visible'] = columns['visible']
+        chars['has_typed'] = columns['has_typed']
+        chars['typed'] = columns['typed']
+        chars['correct'] = columns['correct']
+        words['visible'] = columns['word_visible']
+        words['touched'] = columns['touched']
+        words['behind'] = columns['behind']
+
+        if self._idiomatic:
+            self._buf = []
+            self._words = []
+            self._sentences = []
+            self._reset_index()
+            self._enable_idiomatic_access()
+
+    def apply_level(self, level, first_sentence=0):
+        """Shows or hides words as per the difficulty level.
+
+        The level is applied to the native state by the core library,
+        to the sentences from first_sentence on.  Each line processed
+        is a sentence of the native state, so passing the number of
+        sentences before processing more lines applies the level to
+        those lines alone.  Afterwards only the words whose visibility
+        changed, and their letters, are updated in buf() and words().
+
+        Raises SpeedtypeError if the level is out of range.
+
+        """
+        if not 0 <= level <= 255:
+            # would wrap around into the range of an unsigned char.
+            raise SpeedtypeError(1)
+        if first_sentence == 0:
+            retcode = libmvpcore.speedtype_apply_level(self._state, level)
+        else:
+            retcode = libmvpcore.speedtype_apply_level_from(
+                self._state, level, first_sentence)
+        if retcode != 0:
+            raise SpeedtypeError(retcode)
+
+        if self._idiomatic:
+            state = self.get_state()
+            for i in range(self._first_word(first_sentence), len(self._words)):
+                visible = state.words_ptr[i].visible != 0
+                word = self._words[i]
+                if word is not None and visible != word['visible']:
+                    self.set_word_visible(i, visible)
+
+    def sentence_count(self):
+        """Returns the number of sentences in the native state."""
+        return self.get_state().sentences_len
+
+    def _first_word(self, first_sentence):
+        """Returns the first word of the sentences from first_sentence
+        on, or the number of words if they have none."""
+        state = self.get_state()
+        for i in range(first_sentence, state.sentences_len):
+            sentence = state.sentences_ptr[i]
+            if sentence.words_len > 0:
+                return sentence.words_ptr[0]
+        return state.words_len
+
+    def type_char(self, pos, char):
+        """Types the character at the position in the buffer.
+
+        The native state is updated by the core library, and the
+        character and its word are updated to match.  Returns the
+        Dirty record describing what changed.
+
+        """
+        dirty = Dirty()
+        retcode = libmvpcore.speedtype_type_char(
+            self._state, pos, ord(char), ctypes.byref(dirty))
+        if retcode != 0:
+            raise SpeedtypeError(retcode)
+
+        self._refresh(dirty)
+        return dirty
+
+    def backspace(self, pos):
+        """Clears what was typed at the position in the buffer.
+
+        Returns the Dirty record describing what changed.
+
+        """
+        dirty = Dirty()
+        retcode = libmvpcore.speedtype_backspace(
+            self._state, pos, ctypes.byref(dirty))
+        if retcode != 0:
+            raise SpeedtypeError(retcode)
+
+        self._refresh(dirty)
+        return dirty
+
+    def _refresh(self, dirty):
+        """Updates the character and word changed by a keystroke from
+        the native state."""
+        if not self._idiomatic:
+            return
+
+        # records that have been evicted are converted afresh when
+        # they are restored.
+        raw = self.get_state().buffer_ptr[dirty.character]
+        ch = self._buf[dirty.character]
+        if ch is not None:
+            ch['typed'] = chr(raw.typed) if raw.has_typed != 0 else None
+            ch['correct'] = raw.correct != 0
+
+        if dirty.has_word != 0 and self._words[dirty.word] is not None:
+            word = self._words[dirty.word]
+            word['touched'] = dirty.touched != 0
+            word['behind'] = dirty.behind != 0
+
+    def _sync_words_to_native(self):
+        """Copies the flags of the words into the native state."""
+        state = self.get_state()
+        for (i, word) in enumerate(self._words):
+            raw = state.words_ptr[i]
+            raw.visible = word['visible']
+            raw.touched = word['touched']
+            raw.behind = word['behind']
 
     def get_state(self):
         return ctypes.cast(self._state, POINTER(StateRaw)).contents
 
+    def characters_array(self):
+        """Returns the native character buffer as a NumPy array.
+
+        The array is a structured array with the fields of Character,
+        and shares the memory with the native state.  Nothing is
+        copied, and writing to the array writes to the native state.
+        For example, the letters that are hidden are:
+
+            chars = state.characters_array()
+            hidden = (chars['visible'] == 0) & (chars['has_word'] != 0)
+
+        The native state reallocates the buffer when lines are added,
+        so the array must not be used after process_line().
+
+        """
+        state = self.get_state()
+        return _as_array(state.buffer_ptr, state.buffer_len, Character)
+
+    def words_array(self):
+        """Returns the native list of words as a NumPy array.
+
+        This shares the memory with the native state like
+        characters_array() does.  The word and characters_ptr fields
+        are addresses.
+
+        """
+        state = self.get_state()
+        return _as_array(state.words_ptr, state.words_len, Word)
+
+    def word_characters(self):
+        """Returns the characters of every word in CSR form.
+
+        Returns a pair of arrays (indptr, indices).  The characters
+        of word i are indices[indptr[i]:indptr[i + 1]].  Masks over
+        the characters can be reduced per word with e.g.
+        np.add.reduceat().
+
+        """
+        import numpy as np
+
+        chars = self.characters_array()
+        indices = np.flatnonzero(chars['has_word'])
+
+        # The letters of a word are contiguous and the words appear
+        # in the order of their IDs, so the letters are already sorted
+        # by their words.
+        words = chars['word'][indices]
+        indptr = np.searchsorted(words, np.arange(len(self.words_array()) + 1))
+        return (indptr, indices)
+
     def _enable_idiomatic_access(self):
         """Enables idiomatic access of the data structures.
 
-        Converts the ctypes structures into Python dictionaries that
-        can be idiomatically accessed and serialised.
+        Converts the ctypes structures into records that can be
+        idiomatically accessed like dictionaries and serialised.
 
         The resulting structures contain native Python boolean types
         as opposed to unsigned integers representing C booleans.
         Optional types become Python variables containing either None
         or a valid value.
 
+        The native state only ever grows at the end, so only the
+        characters, words and sentences added since the last call are
+        converted.  Those converted earlier are left as they are.
+
         """
         state = self.get_state()
 
-        buf = []
-        for i in range(0, state.buffer_len):
-            word = None
-            if state.buffer_ptr[i].has_word != 0:
-                word = state.buffer_ptr[i].word
-            typed = None
-            if state.buffer_ptr[i].has_typed != 0:
-                typed = state.buffer_ptr[i].typed
-
-            char = {}
-            char['id'] = state.buffer_ptr[i].id
-            char['char'] = chr(state.buffer_ptr[i].character)
-            char['whitespace'] = state.buffer_ptr[i].whitespace != 0
-            char['newline'] = state.buffer_ptr[i].newline != 0
-            char['word'] = word
-            char['visible'] = state.buffer_ptr[i].visible != 0
-            char['typed'] = typed
-            char['correct'] = state.buffer_ptr[i].correct != 0
-            char['rendered'] = state.buffer_ptr[i].rendered != 0
-            buf.append(char)
-        self._buf = buf
+        for i in range(len(self._buf), state.buffer_len):
+            self._buf.append(_character_to_record(state.buffer_ptr[i]))
 
-        words = []
-        for i in range(0, state.words_len):
-            characters_len = state.words_ptr[i].characters_len
-            characters_ptr = state.words_ptr[i].characters_ptr
-            characters = []
-            for j in range(0, characters_len):
-                characters.append(characters_ptr[j])
-
-            word = {}
-            word['id'] = state.words_ptr[i].id
-            word['word'] = state.words_ptr[i].word.decode()
-            word['visible'] = state.words_ptr[i].visible != 0
-            word['touched'] = state.words_ptr[i].touched != 0
-            word['behind'] = state.words_ptr[i].behind != 0
-            word['characters'] = characters
-
-            words.append(word)
-        self._words = words
+        for i in range(len(self._words), state.words_len):
+            self._words.append(_word_to_record(state.words_ptr[i]))
 
-        sentences = []
-        for i in range(0, state.sentences_len):
-            words_len = state.sentences_ptr[i].words_len
-            words_ptr = state.sentences_ptr[i].words_ptr
-            words = []
-            for j in range(0, words_len):
-                words.append(words_ptr[j])
-            sentences.append(words)
-        self._sentences = sentences
+        for i in range(len(self._sentences), state.sentences_len):
+            self._sentences.append(_sentence_to_list(state.sentences_ptr[i]))
+
+        self._extend_index()
+
+    def evict_records(self, start, end):
+        """Drops the records of the characters from start to end, and
+        of their words, to save memory.
+
+        They are None in buf() and words() until restore_records()
+        converts them from the native state again.  Keystrokes on them
+        meanwhile only update the native state.
+
+        """
+        if not self._idiomatic:
+            return
+
+        for i in range(start, end):
+            self._buf[i] = None
+        for word in self._words_between(start, end):
+            self._words[word] = None
+
+    def restore_records(self, start, end):
+        """Converts the records dropped by evict_records() from the
+        native state again."""
+        if not self._idiomatic:
+            return
+
+        state = self.get_state()
+        for i in range(start, end):
+            if self._buf[i] is None:
+                self._buf[i] = _character_to_record(state.buffer_ptr[i])
+        for word in self._words_between(start, end):
+            if self._words[word] is None:
+                self._words[word] = _word_to_record(state.words_ptr[word])
+
+    def _words_between(self, start, end):
+        """Returns the range of the words of the characters from start
+        to end, which must not split a word."""
+        words = [word for word in self._char_word[start:end] if word >= 0]
+        if len(words) == 0:
+            return range(0)
+        return range(words[0], words[-1] + 1)
+
+    def _reset_index(self):
+        """Indexes the characters and words from scratch."""
+        # The letters of word i are buf()[_word_start[i]:_word_end[i]].
+        # Letters of a word are always next to each other.
+        self._word_start = array('q')
+        self._word_end = array('q')
+
+        # The word that letter i belongs to is _char_word[i], or -1 if
+        # it does not belong to any word.
+        self._char_word = array('q')
+
+        self._extend_index()
+
+    def _extend_index(self):
+        """Indexes the characters and words added since the last
+        call."""
+        for i in range(len(self._char_word), len(self._buf)):
+            word = self._buf[i]['word']
+            self._char_word.append(-1 if word is None else word)
+
+        for i in range(len(self._word_start), len(self._words)):
+            characters = self._words[i]['characters']
+            self._word_start.append(characters[0])
+            self._word_end.append(characters[-1] + 1)
+
+    def word_of(self, index):
+        """Returns the word the character at index belongs to, or
+        None."""
+        word = self._char_word[index]
+        if word < 0:
+            return None
+        else:
+            return self._words[word]
+
+    def characters_of(self, word):
+        """Returns the letters of the word, given as its ID."""
+        return self._buf[self._word_start[word]:self._word_end[word]]
+
+    def set_word_visible(self, word, visible):
+        """Shows or hides the word, given as its ID, and its
+        letters."""
+        self._words[word]['visible'] = visible
+        for ch in self.characters_of(word):
+            ch['visible'] = visible
 
     def buf(self):
         return self._buf
@@ -148,9 +487,203 @@ class State:
 
     def set_buf(self, buf):
         self._buf = buf
+        self._reset_index()
 
     def set_words(self, words):
         self._words = words
+        self._reset_index()
 
     def set_sentences(self, sentences):
         self._sentences = sentences
+
+"""Bits of CharacterRecord._flags for each boolean field."""
+_CHARACTER_FLAGS = {
+    'whitespace': 1,
+    'newline': 2,
+    'visible': 4,
+    'correct': 8,
+    'rendered': 16,
+}
+
+"""Bits of WordRecord._flags for each boolean field."""
+_WORD_FLAGS = {
+    'visible': 1,
+    'touched': 2,
+    'behind': 4,
+}
+
+class CharacterRecord:
+    """A character in State.buf().
+
+    It is accessed like a dictionary, e.g. ch['visible'], and
+    to_dict() turns it into one for serialisation.  The boolean fields
+    are packed into the bits of a single integer, as a session may
+    hold every character of a book.
+
+    """
+    __slots__ = ['id', 'char', 'word', 'typed', '_flags']
+
+    KEYS = ['id', 'char', 'whitespace', 'newline', 'word', 'visible',
+            'typed', 'correct', 'rendered']
+
+    def __init__(self, id, char, word, typed, **flags):
+        self.id = id
+        self.char = char
+        self.word = word
+        self.typed = typed
+        self._flags = _pack_flags(_CHARACTER_FLAGS, flags)
+
+    def __getitem__(self, key):
+        bit = _CHARACTER_FIELDS[key]
+        if bit is None:
+            return getattr(self, key)
+        return self._flags & bit != 0
+
+    def __setitem__(self, key, value):
+        _set_field(self, _CHARACTER_FIELDS, key, value)
+
+    def to_dict(self):
+        return {key: self[key] for key in CharacterRecord.KEYS}
+
+    @staticmethod
+    def from_dict(char):
+        return CharacterRecord(char['id'], char['char'], char['word'],
+                               char['typed'],
+                               **{key: char[key] for key in _CHARACTER_FLAGS})
+
+class WordRecord:
+    """A word in State.words().
+
+    It is accessed like a dictionary in the same way CharacterRecord
+    is.  The letters of a word are always next to each other, so
+    word['characters'] is a range of character indices.
+
+    """
+    __slots__ = ['id', 'word', 'start', 'end', '_flags']
+
+    KEYS = ['id', 'word', 'visible', 'touched', 'behind', 'characters']
+
+    def __init__(self, id, word, characters, **flags):
+        self.id = id
+        self.word = word
+        self.characters = characters
+        self._flags = _pack_flags(_WORD_FLAGS, flags)
+
+    @property
+    def characters(self):
+        return range(self.start, self.end)
+
+    @characters.setter
+    def characters(self, characters):
+        self.start = characters[0]
+        self.end = characters[-1] + 1
+
+    def __getitem__(self, key):
+        bit = _WORD_FIELDS[key]
+        if bit is None:
+            return getattr(self, key)
+        return self._flags & bit != 0
+
+    def __setitem__(self, key, value):
+        _set_field(self, _WORD_FIELDS, key, value)
+
+    def to_dict(self):
+        word = {key: self[key] for key in WordRecord.KEYS}
+        word['characters'] = list(self.characters)
+        return word
+
+    @staticmethod
+    def from_dict(word):
+        return WordRecord(word['id'], word['word'], word['characters'],
+                          **{key: word[key] for key in _WORD_FLAGS})
+
+def _pack_flags(bits, flags):
+    packed = 0
+    for (key, value) in flags.items():
+        if value:
+            packed |= bits[key]
+    return packed
+
+def _fields(keys, bits):
+    """Maps each key of a record to the bit of its flag, or to None if
+    it is an attribute."""
+    fields = dict.fromkeys(keys)
+    fields.update(bits)
+    return fields
+
+_CHARACTER_FIELDS = _fields(CharacterRecord.KEYS, _CHARACTER_FLAGS)
+_WORD_FIELDS = _fields(WordRecord.KEYS, _WORD_FLAGS)
+
+def _set_field(record, fields, key, value):
+    bit = fields[key]
+    if bit is None:
+        setattr(record, key, value)
+    elif value:
+        record._flags |= bit
+    else:
+        record._flags &= ~bit
+
+def _character_to_record(ch):
+    """Converts the Character structure into a CharacterRecord."""
+    word = None
+    if ch.has_word != 0:
+        word = ch.word
+    typed = None
+    if ch.has_typed != 0:
+        typed = chr(ch.typed)
+
+    return CharacterRecord(ch.id, chr(ch.character), word, typed,
+                           whitespace=ch.whitespace != 0,
+                           newline=ch.newline != 0,
+                           visible=ch.visible != 0,
+                           correct=ch.correct != 0,
+                           rendered=ch.rendered != 0)
+
+def _word_to_record(w):
+    """Converts the Word structure into a WordRecord."""
+    return WordRecord(w.id, w.word.decode(),
+                      [w.characters_ptr[0], w.characters_ptr[w.characters_len - 1]],
+                      visible=w.visible != 0,
+                      touched=w.touched != 0,
+                      behind=w.behind != 0)
+
+def _sentence_to_list(sentence):
+    """Converts the Sentence structure into a list of word indices."""
+    words = []
+    for j in range(0, sentence.words_len):
+        words.append(sentence.words_ptr[j])
+    return words
+
+def _as_array(ptr, length, structure):
+    """Makes a NumPy array out of the ctypes array of structures without
+    copying."""
+    import numpy as np
+
+    dtype = _dtype(structure)
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    array = (structure * length).from_address(ctypes.addressof(ptr.contents))
+    return np.frombuffer(array, dtype=dtype)
+
+def _dtype(structure):
+    """Makes a NumPy dtype matching the layout of the ctypes structure.
+
+    Pointers become unsigned integers of the same size.
+
+    """
+    import numpy as np
+
+    names = []
+    formats = []
+    offsets = []
+    for (name, ctype) in structure._fields_:
+        names.append(name)
+        offsets.append(getattr(structure, name).offset)
+        if ctype is c_char_p or issubclass(ctype, ctypes._Pointer):
+            formats.append(np.uintp)
+        else:
+            formats.append(np.dtype(ctype))
+    return np.dtype({'names': names,
+                     'formats': formats,
+                     'offsets': offsets,
+                     'itemsize': ctypes.sizeof(structure)})
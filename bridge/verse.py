@@ -11,21 +11,73 @@ class VerseView(ctypes.Structure):
     _fields_ = [('count', ctypes.c_size_t),
                 ('verses', Verse * 176)]
 
+class VerseSlice(ctypes.Structure):
+    """Locates a verse in the buffer filled by verse_cursor_next()."""
+    _fields_ = [('key', ctypes.c_size_t),
+                ('key_len', ctypes.c_size_t),
+                ('text', ctypes.c_size_t),
+                ('text_len', ctypes.c_size_t)]
+
+"""Number of verses, and bytes of their keys and texts, read from a
+cursor at a time."""
+BATCH_VERSES = 256
+BATCH_BYTES = 64 * 1024
+
+"""Returned by verse_cursor_next() if the next verse does not fit in
+the buffer."""
+BUFFER_TOO_SMALL = 4
+
+class VerseError(Exception):
+    """Indicates the verses could not be read."""
+    pass
+
+def iter_all(translation):
+    """Yields all the verses of the translation.
+
+    The verses are read from a cursor in libmvpcore a batch at a time,
+    so only a batch is held in memory here however large the
+    translation is.  The cursor is closed once the verses run out, or
+    the generator is closed.
+
+    """
+    cursor = ctypes.c_void_p()
+    ret = libmvpcore.verse_cursor_open(ctypes.c_char_p(bytes(translation, 'utf8')),
+                                       ctypes.byref(cursor))
+    if ret != 0:
+        raise VerseError(libmvpcore.session_get_message(ret).decode())
+
+    try:
+        slices = (VerseSlice * BATCH_VERSES)()
+        buf = ctypes.create_string_buffer(BATCH_BYTES)
+        while True:
+            count = ctypes.c_size_t(BATCH_VERSES)
+            size = ctypes.c_size_t(len(buf))
+            ret = libmvpcore.verse_cursor_next(cursor, slices,
+                                               ctypes.byref(count), buf,
+                                               ctypes.byref(size))
+            if ret == BUFFER_TOO_SMALL:
+                # a verse longer than the buffer.
+                buf = ctypes.create_string_buffer(size.value)
+                continue
+            elif ret != 0:
+                raise VerseError(libmvpcore.session_get_message(ret).decode())
+            elif count.value == 0:
+                break
+
+            data = ctypes.string_at(buf, size.value)
+            for verse in slices[:count.value]:
+                yield {
+                    'key': data[verse.key:verse.key + verse.key_len].decode(),
+                    'text': data[verse.text:verse.text + verse.text_len].decode(),
+                    'deleted': '0',
+                }
+    finally:
+        libmvpcore.verse_cursor_close(cursor)
+
 def find_all(translation):
-    """Invokes verse_find_all() function in the libmvpcore."""
-    view = VerseView()
-    ret = libmvpcore.verse_find_all(ctypes.c_char_p(bytes(translation, 'utf8')),
-                                    ctypes.byref(view))
-    records = []
-    if ret == 0:
-        for i in range(0, view.count):
-            verse = view.verses[i]
-            key = ctypes.c_char_p(ctypes.addressof(verse.key)).value.decode()
-            text = ctypes.c_char_p(ctypes.addressof(verse.text)).value.decode()
-            records.append({'key': key, 'text': text, 'deleted': '0'})
-        return records
-    else:
-        return None
+    """Returns all the verses of the translation in a list.  Raises
+    VerseError if they could not be read."""
+    return list(iter_all(translation))
 
 def find_by_book_and_chapter(translation, book, chapter):
     """Invokes verse_find_by_book_and_chapter() in the libmvpcore."""
@@ -17,8 +17,29 @@ COLOURS = {
 }
 DEFAULT_TRANSLATION='esv'
 FONT_FAMILY = 'Menlo'
-PERSIST_INTERVAL = 300
+# how much memory in bytes the forms hidden by switching screens may
+# take up before the least recently shown are destroyed.
+FORM_CACHE_BYTES = 64 * 1024 * 1024
+# where to write the typing latency histograms on exit, e.g.
+# 'latency.json' or 'latency.csv'.  Typing latency is only measured if
+# this is set, or while the latency overlay is shown.
+LATENCY_REPORT = None
+LAYOUT_CACHE_BYTES = 4 * 1024 * 1024
+LAYOUT_CACHE_EXT = '.layout.db'
+# the longest time in milliseconds a keystroke goes without a snapshot
+# of the session that includes it.  Keystrokes are journaled straight
+# away regardless, this bounds how much is replayed on resumption.
+MAX_SNAPSHOT_STALENESS = 10000
 SENTENCE_DELIMITERS = '.:;?!'
+# where the .ui files are compiled to Python modules, see uicache.  If
+# None, the .ui files are parsed at runtime each time they are loaded.
+UI_CACHE_DIR = '__uicache__'
+# how much memory in bytes the verses of recently looked up chapters
+# may take up.
+VERSE_CACHE_BYTES = 1024 * 1024
+# lay out and render only the text near the viewport of the speedtype
+# canvas.  Meant for sessions spanning whole books.
+VIRTUAL_CANVAS = False
 WORD_DELIMITERS = ' .,:;?!'
 
 translation=DEFAULT_TRANSLATION
@@ -5,15 +5,15 @@ import config
 import model
 import re
 import screen
+import uicache
 from PyQt5 import QtWidgets
-from PyQt5 import uic
 
 window = None
 
 class DataEntryForm:
     """form for entering new verses"""
     def __init__(self):
-        self.gui = uic.loadUi("dataentry.ui")
+        self.gui = uicache.load_ui("dataentry.ui")
         self.gui.button_enter.clicked.connect(enter_verses)
         self.gui.action_scrub.triggered.connect(menu_scrub)
         self.gui.action_view_flash_cards.triggered.connect(_view_flash_cards)
@@ -1,9 +1,9 @@
 # coding: utf-8
 """Implements a debug screen for displaying layout graph."""
 
+import uicache
 from math import sqrt
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5 import uic
 from graphlayout import GraphLayout
 from simplelayout import SimpleLayout
 
@@ -21,7 +21,7 @@ class DbgGraph:
         global window
         window = self
 
-        self.gui = uic.loadUi("dbggraph.ui")
+        self.gui = uicache.load_ui("dbggraph.ui")
 
         self.canvas = GraphCanvas()
         self.gui.scroll_area.setWidget(self.canvas)
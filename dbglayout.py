@@ -2,6 +2,7 @@
 """Lets you test out the layout engine for debugging."""
 
 from PyQt5 import QtCore, QtGui, QtWidgets
+from layoutcache import CachedLayout
 
 class DbgLayout(QtWidgets.QDialog):
     """dialog for testing out the layout engine"""
@@ -47,7 +48,7 @@ class DbgLayoutBox(QtWidgets.QWidget):
         self.text = text
 
     def set_layout_engine(self, engine):
-        self.engine = engine
+        self.engine = CachedLayout(engine)
 
     def paintEvent(self, event):
         qp = QtGui.QPainter()
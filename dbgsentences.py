@@ -1,14 +1,14 @@
 # coding: utf-8
 """Inspect the contents of the database."""
 
-from PyQt5 import uic
+import uicache
 
 window = None
 
 class DbgSentences():
     """form for entering new verses"""
     def __init__(self):
-        self.gui = uic.loadUi('debug-sentences.ui')
+        self.gui = uicache.load_ui('debug-sentences.ui')
 
         global window
         window = self
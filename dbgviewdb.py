@@ -4,17 +4,29 @@
 import config
 import json
 import model
-from PyQt5 import uic
+import uicache
+from itertools import islice
+
+"""Number of verses appended to the view at a time."""
+APPEND_BATCH = 256
 
 window = None
 
 class DbgViewDb():
     """form for entering new verses"""
     def __init__(self):
-        self.gui = uic.loadUi('debug-view-database.ui')
+        self.gui = uicache.load_ui('debug-view-database.ui')
 
         global window
         window = self
 
-        records = model.verse.find_all()
-        window.gui.textedit_database.setPlainText(json.dumps(records, indent = 4))
+        # a verse a line, appended as the verses are read so the whole
+        # translation is never held in a list.
+        records = model.verse.iter_all()
+        window.gui.textedit_database.clear()
+        while True:
+            batch = list(islice(records, APPEND_BATCH))
+            if len(batch) == 0:
+                break
+            window.gui.textedit_database.appendPlainText(
+                '\n'.join(json.dumps(record) for record in batch))
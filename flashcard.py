@@ -4,12 +4,13 @@
 import config
 import model
 import screen
+import uicache
 from PyQt5 import Qt, QtCore, QtGui, QtWidgets
-from PyQt5 import uic
 from address import Address
 from key import Key
 from sentence import sentence_make_label, sentences_cons2, sentences_index_by_verseno
 from graphlayout import GraphLayout
+from layoutcache import CachedLayout
 
 window = None
 
@@ -19,21 +20,22 @@ class FlashCardForm:
         global window
         window = self
 
-        self.jump_to_dialog = uic.loadUi('jump-to.ui')
+        self.jump_to_dialog = uicache.load_ui('jump-to.ui')
         self.jump_to_dialog.lineedit_jump_to.textEdited.connect(_peek)
         self.jump_to_dialog.finished.connect(_conclude_jump)
         self.jump_to_dialog.move(0, 0)
 
-        self.gui = uic.loadUi("flashcard.ui")
+        self.gui = uicache.load_ui("flashcard.ui")
         self.gui.action_enter_verses.triggered.connect(_view_enter_verses)
         self.gui.action_speed_type.triggered.connect(_view_speed_type)
         self.gui.action_debug_inspect_database.triggered.connect(debug_view_db)
         self.gui.action_debug_layout_engine.triggered.connect(debug_layout_engine)
         self.gui.action_debug_sentences.triggered.connect(debug_sentences)
         self.gui.action_display_graph.triggered.connect(debug_display_graph)
+        self.gui.action_debug_verse_cache.triggered.connect(debug_verse_cache)
         self.gui.action_jump_to.triggered.connect(_prepare_jump)
 
-        self.canvas = FlashCardCanvas(GraphLayout())
+        self.canvas = FlashCardCanvas(CachedLayout(GraphLayout()))
         self.gui.setCentralWidget(self.canvas)
         self.canvas.setFocus(True)
 
@@ -42,12 +44,31 @@ class FlashCardForm:
         # the very bottom is what we will revert to if the input
         # session fails.
         self.stack = []
-
-        records = model.verse.find_all()
-        if len([r for r in records if r['deleted'] == '0']) == 0:
+        self._show_first_card()
+
+    def suspend(self):
+        """Called by screen when another form is shown instead.
+        Cancels jumping, if the user was about to."""
+        if self.jump_to_dialog.isVisible():
+            self.jump_to_dialog.reject()
+
+    def resume(self):
+        """Called by screen when the form is shown again.  Shows the
+        first card if the database was empty, in case verses have been
+        entered since."""
+        if len(self.stack) == 0:
+            self._show_first_card()
+
+    def _show_first_card(self):
+        # only the first verse is needed, so the rest is not read.
+        verses = model.verse.iter_all()
+        first = next(verses, None)
+        verses.close()
+
+        if first is None:
             self.canvas.set_empty_database()
         else:
-            self.stack.append(_address_from_key(Key.from_str(records[0]['key'])))
+            self.stack.append(_address_from_key(Key.from_str(first['key'])))
             _display_by_address(self.stack[-1])
 
 class FlashCardCanvas(QtWidgets.QWidget):
@@ -292,3 +313,7 @@ def debug_display_graph():
         QtWidgets.QMessageBox.warning(window.gui,
                                       'Debug – Display Graph',
                                       'Unable to display graph')
+
+def debug_verse_cache():
+    QtWidgets.QMessageBox.information(window.gui, 'Debug – Verse Cache',
+                                      model.verse.cache_summary())
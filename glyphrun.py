@@ -0,0 +1,124 @@
+# coding: utf-8
+"""Paints letters in runs of the same colour."""
+
+import config
+from lru import LruCache
+from PyQt5 import QtCore, QtGui
+
+"""Capacity in bytes of the cache of laid out runs."""
+STATIC_TEXT_CACHE_BYTES = 1024 * 1024
+
+"""Estimated overhead in bytes of a laid out run, on top of its
+text."""
+STATIC_TEXT_OVERHEAD = 400
+
+class GlyphPainter:
+    """Paints the letters of SpeedTypeCanvas.
+
+    Letters are dicts with the letter, the name of its colour and its
+    coordinates, as prepared by SpeedTypeCanvas._render().  Adjacent
+    letters on a line that share a colour are drawn together as a run,
+    so a screen of text takes a draw call per run rather than one per
+    letter.
+
+    The runs are laid out once with QStaticText and cached.  The
+    letters are placed by the whole-pixel widths of the individual
+    characters, so kerning is turned off and integer metrics are forced
+    in the font to keep the runs in step.
+
+    """
+    def __init__(self, font):
+        self.font = QtGui.QFont(font)
+        self.font.setKerning(False)
+        self.font.setStyleStrategy(QtGui.QFont.ForceIntegerMetrics)
+
+        fm = QtGui.QFontMetrics(self.font)
+        self.space = fm.width(' ')
+        self.widths = {}
+
+        self.pens = {}
+        for name in list(config.COLOURS.values()) + ['white']:
+            self.pen(name)
+
+        self.statics = LruCache(STATIC_TEXT_CACHE_BYTES,
+                                lambda text, _: STATIC_TEXT_OVERHEAD + len(text))
+
+    def pen(self, name):
+        """Returns the pen for the colour name."""
+        pen = self.pens.get(name)
+        if pen is None:
+            pen = QtGui.QPen(QtGui.QColor(name))
+            self.pens[name] = pen
+        return pen
+
+    def width(self, letter):
+        width = self.widths.get(letter)
+        if width is None:
+            width = QtGui.QFontMetrics(self.font).width(letter)
+            self.widths[letter] = width
+        return width
+
+    def runs(self, letters, indices):
+        """Groups the letters at the indices into runs.
+
+        Returns a list of (text, colour, (x, y)) tuples.  A run ends at
+        a change of colour or line, or where the next letter is not
+        where the run would put it.  Spaces draw nothing, so they join
+        whichever run they follow.  Newlines are None, and are
+        skipped.
+
+        """
+        runs = []
+        text = []
+        colour = None
+        (x0, y0) = (None, None)
+        x = None
+
+        for i in indices:
+            letter = letters[i]
+            if letter is None:
+                continue
+            ch = letter['letter']
+            (lx, ly) = letter['coord']
+
+            contiguous = text and ly == y0 and lx == x
+            if ch == ' ' and contiguous:
+                text.append(ch)
+                x += self.space
+                continue
+
+            if not (contiguous and letter['colour'] == colour):
+                if text:
+                    runs.append((''.join(text), colour, (x0, y0)))
+                if ch == ' ':
+                    text = []
+                    continue
+                text = []
+                colour = letter['colour']
+                (x0, y0) = (lx, ly)
+                x = lx
+
+            text.append(ch)
+            x += self.width(ch)
+
+        if text:
+            runs.append((''.join(text), colour, (x0, y0)))
+        return runs
+
+    def paint(self, qp, letters, indices):
+        """Paints the letters at the indices."""
+        qp.setFont(self.font)
+        for (text, colour, (x, y)) in self.runs(letters, indices):
+            qp.setPen(self.pen(colour))
+            qp.drawStaticText(QtCore.QPointF(x, y), self.static_text(text))
+
+    def static_text(self, text):
+        """Returns the laid out run for the text."""
+        static = self.statics.get(text)
+        if static is None:
+            static = QtGui.QStaticText(text)
+            static.setTextFormat(QtCore.Qt.PlainText)
+            static.setPerformanceHint(QtGui.QStaticText.AggressiveCaching)
+            static.prepare(QtGui.QTransform(), self.font)
+            self.statics.put(text, static)
+        return static
@@ -1,102 +1,177 @@
 """Use an algorithm based on graph to layout words in the flash
 card"""
 
-import networkx as nx
-
 OPTIMAL_LINE_WIDTH = 30
+
+"""Breaking the text looks back no further than the first line longer
+than this, which keeps it linear in the number of words.  The bound is
+a heuristic: next to a very long word, a line longer still can be
+cheaper than the short lines around it, and such a layout is missed.
+The first line past the bound is always considered, as is a line of a
+single word, however long."""
+MAX_LINE_WIDTH = 2 * OPTIMAL_LINE_WIDTH
+
 START_NODE = 'START'
 END_NODE = 'END'
 
 class GraphLayout:
+    def __init__(self):
+        self.text = None
+        self._graph = None
+        self._shortest_path = None
+
     def layout(self, text):
+        """Breaks the text into lines.
+
+        Conceptually, every contiguous run of words is a node in a
+        graph, and the layout is the cheapest path through the graph.
+        The path is found with dynamic programming over the word
+        boundaries instead, without building the graph.  The graph is
+        only built if it is asked for, e.g. by the debug screen.
+
+        """
+        self.text = text
+        self._graph = None
+        self._shortest_path = None
+
         queue = _create_word_queue(text)
+        return [' '.join(queue[start:end])
+                for (start, end) in _break_lines(queue)]
+
+    def cache_key(self):
+        """Identifies the engine and the parameters its layout depends
+        on."""
+        return ('GraphLayout', OPTIMAL_LINE_WIDTH, MAX_LINE_WIDTH)
+
+    @property
+    def graph(self):
+        """The graph of all the possible lines for the last text."""
+        if self._graph is None:
+            self._build_graph()
+        return self._graph
+
+    @property
+    def shortest_path(self):
+        """The node IDs of the lines chosen for the last text,
+        including the start and end nodes."""
+        if self._shortest_path is None:
+            self._build_graph()
+        return self._shortest_path
+
+    @property
+    def maxlevel(self):
+        return len(_create_word_queue(self.text)) + 2
+
+    def _build_graph(self):
+        """Builds the graph of the last text for inspection.
+
+        Each node is a run of words, and its level is the position of
+        its last word.  An edge connects a line to every line that may
+        follow it, and carries the cost of the line it leaves.
+
+        """
+        import networkx as nx
+
+        queue = _create_word_queue(self.text)
+        graph = nx.DiGraph()
 
         # nodeid is a sequential integer that is uniquely assigned to
         # each node.  This is required since the text cannot be used
         # to uniquly identify each node as some nodes have the same
         # text.
         nodeid = 0
-
-        graph = nx.DiGraph()
-        self.graph = graph
         startnodeid = nodeid
         graph.add_node(startnodeid, text=START_NODE, level=0, cost=0)
         nodeid += 1
 
-        for i, word in enumerate(queue):
-            level = i + 1
-            wordid = nodeid
-            nodeid += 1
-            graph.add_node(wordid, text=word, level=level, cost=0)
-            self._assign_cost(wordid)
-
-            # lists of new nodes and edges to be added after the
-            # iteration.
-            new_nodes = []
-            new_edges = []
-
-            for node in graph:
-                if graph.node[node]['level'] == level - 1:
-                    if graph.node[node]['text'] != START_NODE:
-                        newnodeid = nodeid
-                        nodeid += 1
-                        newnode = ' '.join([graph.node[node]['text'], word])
-
-                        new_nodes.append({'id': newnodeid,
-                                          'text': newnode,
-                                          'level': level,
-                                          'cost': 0})
-
-                        for pred in graph.predecessors(node):
-                            new_edges.append({'from': pred,
-                                              'to': newnodeid,
-                                              'cost': graph.node[pred]['cost']})
-
-                    new_edges.append({'from': node,
-                                      'to': wordid,
-                                      'cost': graph.node[node]['cost']})
-
-            for node in new_nodes:
-                graph.add_node(node['id'],
-                               text=node['text'],
-                               level=node['level'],
-                               cost=node['cost'])
-                self._assign_cost(node['id'])
-
-            for edge in new_edges:
-                graph.add_edge(edge['from'], edge['to'], cost=edge['cost'])
+        # maps (start, end) word indices of a line to its node.
+        nodes = {}
+        for end in range(1, len(queue) + 1):
+            for start in range(end - 1, -1, -1):
+                text = ' '.join(queue[start:end])
+                graph.add_node(nodeid, text=text, level=end,
+                               cost=_line_cost(text))
+                nodes[(start, end)] = nodeid
+                nodeid += 1
+
+                if start == 0:
+                    graph.add_edge(startnodeid, nodes[(start, end)], cost=0)
+                else:
+                    for pred in range(0, start):
+                        predid = nodes[(pred, start)]
+                        graph.add_edge(predid, nodes[(start, end)],
+                                       cost=graph.node[predid]['cost'])
 
         endnodeid = nodeid
-        nodeid += 1
         graph.add_node(endnodeid, text=END_NODE, level=len(queue) + 1, cost=0)
-        for node in graph.nodes():
-            if graph.node[node]['level'] == len(queue):
-                graph.add_edge(node,
-                               endnodeid,
-                               cost=graph.node[node]['cost'])
-
-        self.maxlevel = len(queue) + 2
-
-        self.shortest_path = nx.shortest_path(graph,
-                                              source=startnodeid,
-                                              target=endnodeid,
-                                              weight='cost')
-
-        return [graph.node[nodeid]['text']
-                for nodeid
-                in self.shortest_path[1 : len(self.shortest_path) - 1]]
-
-    def _assign_cost(self, nodeid):
-        node = self.graph.node[nodeid]
-        node['cost'] += _line_length_cost(node['text'])
-        node['cost'] += _post_comma_cost(node['text'])
-        node['cost'] += _post_definitive_cost(node['text'])
-        node['cost'] += _post_preposition_cost(node['text'])
-        node['cost'] += _post_possessive_cost(node['text'])
-
+        if len(queue) == 0:
+            graph.add_edge(startnodeid, endnodeid, cost=0)
+        else:
+            for start in range(0, len(queue)):
+                predid = nodes[(start, len(queue))]
+                graph.add_edge(predid, endnodeid,
+                               cost=graph.node[predid]['cost'])
+
+        self._graph = graph
+        self._shortest_path = [startnodeid] + \
+            [nodes[line] for line in _break_lines(queue)] + [endnodeid]
+
+def _break_lines(queue):
+    """Finds the cheapest way to break the words into lines.
+
+    Returns (start, end) index pairs into queue for each line.  The
+    cost of the best layout of the first n words is worked out from the
+    best layouts of fewer words, looking back no further than
+    MAX_LINE_WIDTH allows.
+
+    """
+    count = len(queue)
+
+    # cost[n] is the cost of the best layout of the first n words,
+    # whose last line starts at the word breaks[n].
+    cost = [0] + [None] * count
+    breaks = [0] * (count + 1)
+
+    for end in range(1, count + 1):
+        tail = _break_cost(queue[end - 1])
+        length = -1
+        for start in range(end - 1, -1, -1):
+            length += len(queue[start]) + 1
+            candidate = cost[start] + _length_cost(length) + tail
+            if cost[end] is None or candidate < cost[end]:
+                cost[end] = candidate
+                breaks[end] = start
+
+            if length > MAX_LINE_WIDTH:
+                break
+
+    lines = []
+    end = count
+    while end > 0:
+        lines.append((breaks[end], end))
+        end = breaks[end]
+    lines.reverse()
+    return lines
+
+def _line_cost(text):
+    return _line_length_cost(text) + _break_cost(text)
+
+def _break_cost(text):
+    """Sums up the costs of breaking the line after the text.
+
+    These only look at the end of the text, so the cost is the same
+    for the last word as for the whole line.
+
+    """
+    return _post_comma_cost(text) \
+        + _post_definitive_cost(text) \
+        + _post_preposition_cost(text) \
+        + _post_possessive_cost(text)
 
 def _line_length_cost(text):
-    length = len(text)
+    return _length_cost(len(text))
+
+def _length_cost(length):
     return 0.01 * pow(length - OPTIMAL_LINE_WIDTH, 2)
 
 def _post_comma_cost(text):
@@ -0,0 +1,139 @@
+# coding: utf-8
+"""Records how long the stages of handling a keystroke take."""
+
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+"""Stages of a keystroke, in the order they happen.  key_to_paint spans
+from the key press to the end of the paint that shows it."""
+STAGES = ['bridge', 'render', 'lookup', 'paint', 'key_to_paint']
+
+PERCENTILES = [50, 95, 99]
+
+class Histogram:
+    """Counts values in buckets of bounded relative error.
+
+    Like an HDR histogram, values are grouped by their magnitude, and
+    each power of two is split into SUB_BUCKETS linear buckets.  A
+    value is reported as the top of its bucket, which is within
+    1 / SUB_BUCKETS of the value.  Memory does not grow with the
+    number of values recorded.
+
+    Values are integers, e.g. microseconds.
+
+    """
+    SUB_BUCKETS = 64
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        value = max(0, int(value))
+        bucket = _bucket(value, self.SUB_BUCKETS)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Returns the value at or below which p percent of the values
+        fall."""
+        if self.count == 0:
+            return 0
+
+        rank = max(1, -(-self.count * p // 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(_bucket_top(bucket, self.SUB_BUCKETS), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0
+
+    def summary(self):
+        """Returns the count, the percentiles, the mean and the
+        maximum."""
+        summary = {'count': self.count}
+        for p in PERCENTILES:
+            summary['p{0}'.format(p)] = self.percentile(p)
+        summary['mean'] = round(self.mean(), 1)
+        summary['max'] = self.max
+        return summary
+
+class LatencyRecorder:
+    """Keeps a histogram of microseconds for each stage."""
+    def __init__(self):
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self._key_start = None
+
+    @contextmanager
+    def measure(self, stage):
+        """Times the body of the with statement as the stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        self.histograms[stage].record(seconds * 1e6)
+
+    def key_pressed(self):
+        """Marks the start of a keystroke.  The keystroke ends at the
+        next paint."""
+        if self._key_start is None:
+            self._key_start = time.perf_counter()
+
+    def painted(self):
+        """Marks the end of a paint, and with it any keystroke being
+        timed."""
+        if self._key_start is not None:
+            self.record('key_to_paint', time.perf_counter() - self._key_start)
+            self._key_start = None
+
+    def summary(self):
+        return {stage: self.histograms[stage].summary() for stage in STAGES}
+
+    def text(self):
+        """Formats the summary in a table of milliseconds."""
+        lines = ['{0:<13}{1:>7}{2:>7}{3:>7}{4:>7}'.format(
+            'ms', 'p50', 'p95', 'p99', 'max')]
+        for (stage, summary) in self.summary().items():
+            lines.append('{0:<13}{1:>7.2f}{2:>7.2f}{3:>7.2f}{4:>7.2f}'.format(
+                stage, summary['p50'] / 1e3, summary['p95'] / 1e3,
+                summary['p99'] / 1e3, summary['max'] / 1e3))
+        return '\n'.join(lines)
+
+    def flush(self, path):
+        """Writes the summary in microseconds to the file.
+
+        The file is CSV if its name ends with .csv, and JSON otherwise.
+
+        """
+        summary = self.summary()
+        with open(path, 'w', newline='') as f:
+            if path.endswith('.csv'):
+                fields = ['stage', 'count'] + \
+                    ['p{0}'.format(p) for p in PERCENTILES] + ['mean', 'max']
+                writer = csv.DictWriter(f, fields)
+                writer.writeheader()
+                for (stage, row) in summary.items():
+                    writer.writerow(dict(row, stage=stage))
+            else:
+                json.dump(summary, f, indent=2)
+
+def _bucket(value, sub_buckets):
+    """Returns the bucket of the value as (magnitude, sub-bucket)."""
+    magnitude = max(0, value.bit_length() - sub_buckets.bit_length())
+    return (magnitude, value >> magnitude)
+
+def _bucket_top(bucket, sub_buckets):
+    (magnitude, sub) = bucket
+    return ((sub + 1) << magnitude) - 1
@@ -0,0 +1,199 @@
+# coding: utf-8
+"""Memoises the layout engines in memory and on disk."""
+
+import atexit
+import config
+import hashlib
+import json
+import sqlite3
+import threading
+from lru import LruCache
+
+"""Version of the layout algorithms.  It is part of the key of every
+stored layout, so raise it when a change to an engine lays out the
+same text differently, and layouts stored before are not served."""
+LAYOUT_VERSION = 2
+
+"""Estimated overhead in bytes of keeping an entry in memory, on top
+of the text of its lines."""
+ENTRY_OVERHEAD = 200
+
+"""Number of layouts stored in memory before they are written to the
+database together, in a single transaction."""
+WRITE_BATCH = 64
+
+_cache = None
+
+class LayoutCache:
+    """Stores the lines of laid out text.
+
+    Recently used layouts are kept in memory, bounded by
+    config.LAYOUT_CACHE_BYTES.  Every layout is also stored in a
+    database next to the translation database, so that the text does
+    not need to be laid out again in later runs.  The layouts are
+    written WRITE_BATCH at a time, or when flush() is called.
+
+    The cache may be used from more than one thread.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.disk_hits = 0
+        self.memory = LruCache(config.LAYOUT_CACHE_BYTES, _sizeof)
+        self._lock = threading.Lock()
+
+        # the layouts not written to the database yet, by key.
+        self._unsaved = {}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA synchronous = OFF')
+        self._db.execute('CREATE TABLE IF NOT EXISTS layout ('
+                         'engine TEXT, digest TEXT, lines TEXT, '
+                         'PRIMARY KEY (engine, digest))')
+        self._db.commit()
+
+    def get(self, engine, digest):
+        """Looks up the lines for the engine and text digest.
+
+        Returns None if the text has never been laid out by the
+        engine.
+
+        """
+        key = (engine, digest)
+        with self._lock:
+            lines = self.memory.get(key)
+            if lines is None:
+                lines = self._unsaved.get(key)
+            if lines is None:
+                row = self._db.execute('SELECT lines FROM layout '
+                                       'WHERE engine = ? AND digest = ?',
+                                       key).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    lines = tuple(json.loads(row[0]))
+                    self.memory.put(key, lines)
+            return lines
+
+    def put(self, engine, digest, lines):
+        """Stores the lines for the engine and text digest."""
+        key = (engine, digest)
+        lines = tuple(lines)
+        with self._lock:
+            self.memory.put(key, lines)
+            self._unsaved[key] = lines
+            if len(self._unsaved) >= WRITE_BATCH:
+                self._write()
+        return lines
+
+    def flush(self):
+        """Writes the layouts stored since the last write to the
+        database."""
+        with self._lock:
+            self._write()
+
+    def close(self):
+        """Writes the layouts not written yet, and closes the database.
+        The cache cannot be used afterwards."""
+        with self._lock:
+            self._write()
+            self._db.close()
+            self.memory.clear()
+
+    def _write(self):
+        if len(self._unsaved) > 0:
+            self._db.executemany('INSERT OR REPLACE INTO layout '
+                                 'VALUES (?, ?, ?)',
+                                 [(engine, digest, json.dumps(lines))
+                                  for ((engine, digest), lines)
+                                  in self._unsaved.items()])
+            self._db.commit()
+            self._unsaved.clear()
+
+    def stats(self):
+        """Returns the hit, miss and eviction counters.
+
+        hits counts the layouts found in memory and disk_hits those
+        found on disk instead, and misses those laid out afresh.
+
+        """
+        with self._lock:
+            stats = self.memory.stats()
+            stats['disk_hits'] = self.disk_hits
+            stats['misses'] -= self.disk_hits
+            return stats
+
+class CachedLayout:
+    """Wraps a layout engine and memoises its layouts.
+
+    The layouts are keyed by the engine's cache_key(), which
+    identifies the engine and the parameters the layout depends on.
+    Engines without cache_key() are identified by their class alone.
+
+    """
+    def __init__(self, engine, cache=None):
+        self.engine = engine
+        self.cache = cache
+
+    def cache_key(self):
+        """Identifies the wrapped engine, which lays out the same as
+        this one."""
+        if hasattr(self.engine, 'cache_key'):
+            return self.engine.cache_key()
+        else:
+            return _class_key(self.engine)
+
+    def fork(self):
+        """Returns a new engine that lays out the same as this one, for
+        use from another thread.
+
+        The wrapped engine keeps the last text it laid out, so the new
+        one wraps an engine of its own, with a cache of its own over
+        the same database.  Call close() on the new engine once it is
+        done with.
+
+        """
+        cache = self.cache or get_cache()
+        return CachedLayout(type(self.engine)(), LayoutCache(cache.path))
+
+    def flush(self):
+        """Writes the layouts stored so far to the database, e.g. after
+        laying out a batch of text."""
+        (self.cache or get_cache()).flush()
+
+    def close(self):
+        """Closes the cache the engine was given, e.g. by fork().  The
+        shared cache is left open."""
+        if self.cache is not None:
+            self.cache.close()
+
+    def layout(self, text):
+        cache = self.cache or get_cache()
+        engine = _engine_key(self.engine)
+        digest = hashlib.sha1(text.encode('utf8')).hexdigest()
+
+        lines = cache.get(engine, digest)
+        if lines is None:
+            lines = cache.put(engine, digest, self.engine.layout(text))
+        return list(lines)
+
+def get_cache():
+    """Returns the layout cache shared by all the layout engines.  The
+    layouts not written yet are written on exit."""
+    global _cache
+    if _cache is None:
+        _cache = LayoutCache(config.translation + config.LAYOUT_CACHE_EXT)
+        atexit.register(_cache.flush)
+    return _cache
+
+def _engine_key(engine):
+    if hasattr(engine, 'cache_key'):
+        key = engine.cache_key()
+    else:
+        key = _class_key(engine)
+    return repr((LAYOUT_VERSION, key))
+
+def _class_key(engine):
+    return (type(engine).__module__, type(engine).__qualname__)
+
+def _sizeof(key, lines):
+    return ENTRY_OVERHEAD + len(key[1]) + sum(len(line) for line in lines)
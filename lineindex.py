@@ -0,0 +1,58 @@
+# coding: utf-8
+"""Finds the letters on the lines within a range of y coordinates."""
+
+from bisect import bisect_left, bisect_right
+
+class LineIndex:
+    """Indexes the lines of letters by their y coordinates.
+
+    Letters are numbered in the order they are painted, and each line
+    holds a run of them.  Lines must be appended from top to bottom.
+
+    """
+    def __init__(self, fontheight):
+        self.fontheight = fontheight
+
+        # the y coordinate of each line, in ascending order.
+        self.ys = []
+
+        # the first letter on each line.
+        self.starts = []
+
+        # the number of letters on all the lines.
+        self.count = 0
+
+    def __len__(self):
+        return len(self.ys)
+
+    def clear(self):
+        self.ys = []
+        self.starts = []
+        self.count = 0
+
+    def append(self, y):
+        """Adds a letter at y.  Starts a new line if y is below the
+        last line."""
+        if len(self.ys) == 0 or y > self.ys[-1]:
+            self.ys.append(y)
+            self.starts.append(self.count)
+        self.count += 1
+
+    def letters_between(self, top, bottom):
+        """Returns the range of letters on the lines that overlap top
+        to bottom, inclusive.
+
+        A line overlaps if its glyphs, fontheight tall, reach below top
+        and it starts above bottom.
+
+        """
+        first = bisect_right(self.ys, top - self.fontheight)
+        last = bisect_left(self.ys, bottom) - 1
+        if first > last:
+            return range(0)
+
+        if last + 1 < len(self.starts):
+            end = self.starts[last + 1]
+        else:
+            end = self.count
+        return range(self.starts[first], end)
@@ -0,0 +1,86 @@
+# coding: utf-8
+"""Least recently used cache bounded by the size of its entries."""
+
+from collections import OrderedDict
+
+class LruCache:
+    """Maps keys to values and evicts the least recently used entries
+    once the entries take up more than the capacity in bytes.
+
+    sizeof is a function that estimates the size of an entry from its
+    key and value.  evicted, if given, is called with the key and value
+    of each entry evicted, or not stored for being larger than the
+    capacity.
+
+    """
+    def __init__(self, capacity, sizeof, evicted=None):
+        self.capacity = capacity
+        self.sizeof = sizeof
+        self.evicted = evicted
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Looks up the key and marks it as the most recently used."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        else:
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Stores the value and evicts old entries to make room."""
+        self.discard(key)
+
+        size = self.sizeof(key, value)
+        if size > self.capacity:
+            # would evict everything else and still not fit.
+            if self.evicted is not None:
+                self.evicted(key, value)
+            return
+
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.capacity:
+            evicted_key, (evicted_value, evicted) = \
+                self._entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+            if self.evicted is not None:
+                self.evicted(evicted_key, evicted_value)
+
+    def discard(self, key):
+        """Removes the entry for the key if there is one."""
+        if key in self._entries:
+            _, size = self._entries.pop(key)
+            self.size -= size
+
+    def items(self):
+        """Returns the keys and values from the least recently used."""
+        return [(key, value) for (key, (value, _)) in self._entries.items()]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """Returns the counters for tuning the capacity."""
+        return {
+            'entries': len(self._entries),
+            'size': self.size,
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,15 +1,58 @@
 import config
 from bridge import verse
+from lru import LruCache
 from sdb import Sdb
 from key import Key
 
+"""Estimated overhead in bytes of a verse record, on top of its key
+and text."""
+RECORD_OVERHEAD = 400
+
+# the records of the chapters looked up recently, by translation, book
+# and chapter.
+_chapters = None
+
 def find_all():
     """Finds all verses in the database."""
     return verse.find_all(config.translation)
 
+def iter_all():
+    """Yields all verses in the database, a batch at a time.  See
+    bridge.verse.iter_all()."""
+    return verse.iter_all(config.translation)
+
 def find_by_book_and_chapter(book, chapter):
-    """Finds verses by the given book and chapter."""
-    return verse.find_by_book_and_chapter(config.translation, book, chapter)
+    """Finds verses by the given book and chapter.
+
+    The records are cached until the chapter is inserted into, so they
+    are shared between callers and must not be modified.
+
+    """
+    key = (config.translation, book, int(chapter))
+    cache = _get_cache()
+    records = cache.get(key)
+    if records is None:
+        records = verse.find_by_book_and_chapter(config.translation, book,
+                                                 chapter)
+        if records is not None:
+            cache.put(key, records)
+    return records
+
+def cache_stats():
+    """Returns the counters of the cache of chapters."""
+    return _get_cache().stats()
+
+def cache_summary():
+    """Describes the cache of chapters for the debug screens."""
+    stats = cache_stats()
+    lookups = stats['hits'] + stats['misses']
+    return ('{0} chapters cached, {1} KB of {2} KB\n'
+            '{3} hits, {4} misses, {5:.0f}% hit rate\n'
+            '{6} evicted'.format(
+                stats['entries'], stats['size'] // 1024,
+                stats['capacity'] // 1024, stats['hits'], stats['misses'],
+                100 * stats['hits'] / lookups if lookups > 0 else 0,
+                stats['evictions']))
 
 def insert(book, chapter, verseno, text):
     """Inserts a verse."""
@@ -23,12 +66,16 @@ def insert(book, chapter, verseno, text):
 
         key = ' '.join([book, str(chapter)])
         key = ':'.join([key, str(verseno)])
-        return verse_table.insert({
+        ret = verse_table.insert({
             'key': key,
             'text': text,
             'deleted': '0',
         })
 
+    # the chapter is looked up again next time.
+    _get_cache().discard((config.translation, book, int(chapter)))
+    return ret
+
 def _key_starts_with(key_string, book, chapter):
     """Checks if the given record has book and chapter as the key."""
     key = Key.from_str(key_string)
@@ -36,3 +83,13 @@ def _key_starts_with(key_string, book, chapter):
         return True
     else:
         return False
+
+def _get_cache():
+    global _chapters
+    if _chapters is None:
+        _chapters = LruCache(config.VERSE_CACHE_BYTES, _sizeof)
+    return _chapters
+
+def _sizeof(key, records):
+    return sum(RECORD_OVERHEAD + len(record['key']) + len(record['text'])
+               for record in records)
@@ -38,6 +38,15 @@ typedef struct {
     VerseRaw verses[176];
 } VerseView;
 
+typedef struct VerseCursor VerseCursor;
+
+typedef struct {
+    size_t key;
+    size_t key_len;
+    size_t text;
+    size_t text_len;
+} VerseSlice;
+
 typedef struct {
     size_t index;
     size_t length;
@@ -62,6 +71,13 @@ extern void sentences_from_verses(const char **verses_ptr,
                                   size_t *sentences_len);
 
 extern int verse_find_all(const char *translation, VerseView *view);
+extern int verse_cursor_open(const char *translation, VerseCursor **cursor);
+extern int verse_cursor_next(VerseCursor *cursor,
+                             VerseSlice *slices,
+                             size_t *slices_len,
+                             unsigned char *buf,
+                             size_t *buf_len);
+extern void verse_cursor_close(VerseCursor *cursor);
 extern int verse_find_by_book_and_chapter(const char *translation,
                                           VerseView *view,
                                           const char *book,
@@ -50,11 +50,30 @@ typedef struct {
     SpeedTypeWordRaw *words_ptr;
     size_t sentences_len;
     SpeedTypeSentenceRaw *sentences_ptr;
+
+    // private to the core library
+    size_t buffer_capacity;
+    size_t words_capacity;
+    size_t sentences_capacity;
 } SpeedTypeStateRaw;
 
+typedef struct {
+    CharId character;
+    uint32_t has_word;      // boolean
+    WordId word;
+    uint32_t touched;       // boolean
+    uint32_t behind;        // boolean
+    uint32_t word_changed;  // boolean
+    uint32_t complete;      // boolean
+} SpeedTypeDirtyRaw;
+
 extern SpeedTypeStateRaw *speedtype_new();
 extern void speedtype_delete(SpeedTypeStateRaw*);
 extern int speedtype_process_line(SpeedTypeStateRaw*, const char*);
-extern void speedtype_apply_level(SpeedTypeStateRaw*, unsigned char);
+extern int speedtype_process_lines(SpeedTypeStateRaw*, const char**, size_t);
+extern int speedtype_apply_level(SpeedTypeStateRaw*, unsigned char);
+extern int speedtype_apply_level_from(SpeedTypeStateRaw*, unsigned char, size_t);
+extern int speedtype_type_char(SpeedTypeStateRaw*, size_t, uint32_t, SpeedTypeDirtyRaw*);
+extern int speedtype_backspace(SpeedTypeStateRaw*, size_t, SpeedTypeDirtyRaw*);
 
 #endif /* speedtype_h */
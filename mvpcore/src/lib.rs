@@ -22,7 +22,7 @@ mod verse;
 
 pub use capi::*;
 pub use layout::graph::*;
-pub use model::speedtype::strong::speedtype_apply_level;
+pub use model::speedtype::strong::{speedtype_apply_level, speedtype_apply_level_from};
 pub use model::strong::sentences_from_verses;
 pub use speedtype::state::*;
 pub use verse::*;
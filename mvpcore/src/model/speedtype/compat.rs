@@ -63,9 +63,39 @@ impl<T> Buffer<T> {
     pub fn into_vec(self) -> Vec<T> {
         self.into()
     }
+
+    /// Takes over the allocation of the buffer, which has room for
+    /// capacity elements, e.g. one made by into_raw_parts().
+    pub unsafe fn into_vec_with_capacity(self, capacity: usize) -> Vec<T> {
+        if capacity == 0 {
+            Vec::new()
+        } else {
+            Vec::from_raw_parts(self.ptr, self.len, capacity)
+        }
+    }
+
+    /// Makes a buffer of the vector without giving up its spare
+    /// capacity, which is returned alongside.
+    pub fn into_raw_parts(from: Vec<T>) -> (Self, usize) {
+        let mut from = mem::ManuallyDrop::new(from);
+        let buffer = Self {
+            len: from.len(),
+            ptr: from.as_mut_ptr(),
+        };
+        (buffer, from.capacity())
+    }
+
+    /// Views the buffer as a slice, without taking it over.
+    pub unsafe fn as_slice_mut<'a>(&self) -> &'a mut [T] {
+        if self.len == 0 {
+            &mut []
+        } else {
+            ::std::slice::from_raw_parts_mut(self.ptr, self.len)
+        }
+    }
 }
 
-#[derive(Debug)]
+#[derive(Clone, Debug)]
 #[repr(C)]
 pub struct Character {
     pub id: CharacterId,
@@ -157,10 +187,18 @@ impl From<strong::Sentence> for Sentence {
 }
 
 #[derive(Debug, Default)]
+#[repr(C)]
 pub struct State {
     pub buffer: Buffer<Character>,
     pub words: Buffer<Word>,
     pub sentences: Buffer<Sentence>,
+
+    /// The number of elements there is room for in each of the
+    /// buffers, so that lines are appended in place.  These are not
+    /// part of the interface, which ends at sentences.
+    pub buffer_capacity: libc::size_t,
+    pub words_capacity: libc::size_t,
+    pub sentences_capacity: libc::size_t,
 }
 
 impl From<strong::State> for State {
@@ -169,11 +207,42 @@ impl From<strong::State> for State {
         let words: Vec<_> = from.words.into_iter().map(From::from).collect();
         let sentences: Vec<_> = from.sentences.into_iter().map(From::from).collect();
 
-        Self {
-            buffer: buffer.into(),
-            words: words.into(),
-            sentences: sentences.into(),
-        }
+        let mut to = Self::default();
+        to.put_vecs(buffer, words, sentences);
+        to
+    }
+}
+
+impl State {
+    /// Takes the buffers out of the state, leaving it empty.
+    pub unsafe fn take_vecs(&mut self) -> (Vec<Character>, Vec<Word>, Vec<Sentence>) {
+        let taken = mem::replace(self, Self::default());
+        (
+            taken.buffer.into_vec_with_capacity(taken.buffer_capacity),
+            taken.words.into_vec_with_capacity(taken.words_capacity),
+            taken.sentences.into_vec_with_capacity(taken.sentences_capacity),
+        )
+    }
+
+    /// Puts the buffers into the state, which must be empty, e.g. after
+    /// take_vecs().  Their spare capacity is kept.
+    pub fn put_vecs(
+        &mut self,
+        buffer: Vec<Character>,
+        words: Vec<Word>,
+        sentences: Vec<Sentence>,
+    ) {
+        let (buffer, buffer_capacity) = Buffer::into_raw_parts(buffer);
+        let (words, words_capacity) = Buffer::into_raw_parts(words);
+        let (sentences, sentences_capacity) = Buffer::into_raw_parts(sentences);
+        *self = Self {
+            buffer,
+            words,
+            sentences,
+            buffer_capacity,
+            words_capacity,
+            sentences_capacity,
+        };
     }
 }
 
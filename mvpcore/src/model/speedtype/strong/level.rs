@@ -1,4 +1,6 @@
+use libc;
 use model::speedtype::{compat, strong};
+use std::ffi::CStr;
 #[allow(unused_imports)]
 use rand::{thread_rng, Rng};
 
@@ -15,6 +17,16 @@ pub enum Level {
 }
 
 impl Level {
+    /// Converts the value into a level, or returns None if it is out
+    /// of range.
+    pub fn from_u8(val: u8) -> Option<Level> {
+        if val > Level::Level5 as u8 {
+            None
+        } else {
+            Some(Level::from(val))
+        }
+    }
+
     pub fn hidden_words(self) -> f32 {
         match self {
             Level::Level1 => 0.0,
@@ -138,16 +150,47 @@ struct Permutation {
     pub articles: f64,
 }
 
+/// Applies the difficulty level to the whole state.
+///
+/// Returns a non-zero value if level is out of range.
 #[no_mangle]
-pub unsafe fn speedtype_apply_level(state: *mut compat::State, level: u8) {
+pub unsafe fn speedtype_apply_level(state: *mut compat::State, level: u8) -> libc::c_int {
+    let level = match Level::from_u8(level) {
+        Some(level) => level,
+        None => return 1,
+    };
+
     let mut s: compat::State = ::std::mem::uninitialized();
     ::std::ptr::copy_nonoverlapping(state, &mut s, 1);
     let mut s: strong::State = s.into();
-    let level = Level::from(level);
 
     imp::apply_level(&mut s, level);
     let s: compat::State = s.into();
     ::std::ptr::copy_nonoverlapping(&s, state, 1);
+    0
+}
+
+/// Applies the difficulty level to the sentences from first on.
+///
+/// Does the same as speedtype_apply_level(), but leaves the sentences
+/// before first as they are, e.g. when first is where newly processed
+/// lines begin.  Only the sentences it applies to are converted, and
+/// the visibility is written back into the state in place.
+///
+/// Returns a non-zero value if level is out of range.
+#[no_mangle]
+pub unsafe fn speedtype_apply_level_from(
+    state: *mut compat::State,
+    level: u8,
+    first: libc::size_t,
+) -> libc::c_int {
+    match Level::from_u8(level) {
+        Some(level) => {
+            imp::apply_level_from(&mut *state, level, first);
+            0
+        }
+        None => 1,
+    }
 }
 
 mod imp {
@@ -163,6 +206,11 @@ mod imp {
         let sentences = &state.sentences;
 
         for sentence in sentences {
+            // A line without any words, e.g. a line of punctuations.
+            if sentence.0.is_empty() {
+                continue;
+            }
+
             // I know the words are listed in the order they appear in
             // sentences.  I will cheat a little based on this
             // knowledge.
@@ -205,6 +253,65 @@ mod imp {
         }
     }
 
+    /// Applies the difficulty level to the sentences from first on.
+    ///
+    /// The words and letters of those sentences are copied into a
+    /// state of their own, which apply_level() works on.  Words and
+    /// letters keep their IDs, which are also their positions in the
+    /// whole state, so the visibility is copied back by ID.
+    pub unsafe fn apply_level_from(state: &mut compat::State, level: Level, first: usize) {
+        let buffer = state.buffer.as_slice_mut();
+        let words = state.words.as_slice_mut();
+        let sentences = state.sentences.as_slice_mut();
+        if first >= sentences.len() {
+            return;
+        }
+
+        let first_word = match sentences[first..]
+            .iter()
+            .filter_map(|sentence| sentence.0.as_slice_mut().first().cloned())
+            .next()
+        {
+            Some(word) => word,
+            // no words to show or hide.
+            None => return,
+        };
+        let first_char = words[first_word].characters.as_slice_mut()[0];
+
+        let mut tail = strong::State {
+            buffer: buffer[first_char..]
+                .iter()
+                .map(|ch| ch.clone().into())
+                .collect(),
+            words: words[first_word..].iter().map(|word| copy_word(word)).collect(),
+            sentences: sentences[first..]
+                .iter()
+                .map(|sentence| strong::Sentence(sentence.0.as_slice_mut().to_vec()))
+                .collect(),
+        };
+        apply_level(&mut tail, level);
+
+        for ch in &tail.buffer {
+            buffer[ch.id].visible = ch.visible as libc::boolean_t;
+            buffer[ch.id].rendered = ch.rendered as libc::boolean_t;
+        }
+        for word in &tail.words {
+            words[word.id].visible = word.visible as libc::boolean_t;
+        }
+    }
+
+    /// Copies the word out of the state, which keeps its own.
+    unsafe fn copy_word(word: &compat::Word) -> strong::Word {
+        strong::Word {
+            id: word.id,
+            word: CStr::from_ptr(word.word).to_string_lossy().to_string(),
+            visible: word.visible != 0,
+            touched: word.touched != 0,
+            behind: word.behind != 0,
+            characters: word.characters.as_slice_mut().to_vec(),
+        }
+    }
+
     /// Applies the difficulty level in the given words.
     ///
     /// Sets the difficulty level and shows or hides some words as
@@ -302,17 +409,26 @@ mod imp {
     /// Hides a specific word.
     fn hide_word(buffer: &mut [strong::Character], word: &mut strong::Word) {
         word.visible = false;
-        for ch in buffer.iter_mut().filter(|ch| ch.word == Some(word.id)) {
-            ch.visible = false;
-            ch.rendered = false;
-        }
+        set_visible(buffer, word, false);
     }
 
     ///Reveals a specific word.
     fn reveal_word(buffer: &mut [strong::Character], word: &mut strong::Word) {
         word.visible = true;
-        for ch in buffer.iter_mut().filter(|ch| ch.word == Some(word.id)) {
-            ch.visible = true;
+        set_visible(buffer, word, true);
+    }
+
+    /// Shows or hides the letters of the word.
+    ///
+    /// The character IDs are their positions in the whole buffer, and
+    /// buffer is a contiguous part of it, so the letters are looked up
+    /// directly instead of searching the buffer.
+    fn set_visible(buffer: &mut [strong::Character], word: &strong::Word, visible: bool) {
+        let base = buffer.first().expect("empty buffer").id;
+        for &id in &word.characters {
+            let ch = &mut buffer[id - base];
+            debug_assert_eq!(ch.word, Some(word.id));
+            ch.visible = visible;
             ch.rendered = false;
         }
     }
@@ -46,10 +46,8 @@ pub struct State {
 }
 
 impl From<compat::State> for State {
-    fn from(from: compat::State) -> Self {
-        let buffer: Vec<_> = from.buffer.into();
-        let words: Vec<_> = from.words.into();
-        let sentences: Vec<_> = from.sentences.into();
+    fn from(mut from: compat::State) -> Self {
+        let (buffer, words, sentences) = unsafe { from.take_vecs() };
 
         Self {
             buffer: buffer.into_iter().map(From::from).collect(),
@@ -1,9 +1,9 @@
-use capi::Result;
 use libc;
 use model::speedtype::compat;
 use model::speedtype::strong;
 use std::boxed::Box;
 use std::ffi::CStr;
+use std::slice;
 
 const WORD_DELIMITERS: &str = " .,:;?!";
 
@@ -34,33 +34,190 @@ pub unsafe fn speedtype_process_line(
     state: *mut compat::State,
     line: *const libc::c_char,
 ) -> libc::c_int {
-    let line = CStr::from_ptr(line);
-    let mut s: compat::State = ::std::mem::uninitialized();
-    ::std::ptr::copy_nonoverlapping(state, &mut s, 1);
-    let mut s: strong::State = s.into();
-    match imp::process_line(&mut s, line) {
-        Ok(()) => {
-            let s: compat::State = s.into();
-            ::std::ptr::copy_nonoverlapping(&s, state, 1);
-            0
-        }
+    speedtype_process_lines(state, &line, 1)
+}
+
+/// Processes the given lines of text.
+///
+/// Does the same as speedtype_process_line() for each of the count
+/// lines in the array at lines.  If any of the lines is not valid
+/// UTF-8, none of them are processed.
+///
+/// The lines are appended to the state in place.  Only the new
+/// characters, words and sentences are converted, and the buffers
+/// keep spare room to grow into, so the cost depends on the length
+/// of the lines and not on the size of the state.
+#[no_mangle()]
+pub unsafe fn speedtype_process_lines(
+    state: *mut compat::State,
+    lines: *const *const libc::c_char,
+    count: libc::size_t,
+) -> libc::c_int {
+    if count == 0 {
+        return 0;
+    }
+
+    let lines: ::std::result::Result<Vec<_>, _> = slice::from_raw_parts(lines, count)
+        .iter()
+        .map(|&line| CStr::from_ptr(line).to_str())
+        .collect();
+    let lines = match lines {
+        Ok(lines) => lines,
         Err(e) => {
             eprintln!("{:?}", e);
-            1
+            return 1;
         }
+    };
+
+    let state = &mut *state;
+    let (mut buffer, mut words, mut sentences) = state.take_vecs();
+    for line in lines {
+        imp::process_line(&mut buffer, &mut words, &mut sentences, line);
+    }
+    state.put_vecs(buffer, words, sentences);
+    0
+}
+
+/// Describes what a keystroke changed in the state.
+#[derive(Debug, Default)]
+#[repr(C)]
+pub struct Dirty {
+    /// The character that was typed or cleared.
+    pub character: compat::CharacterId,
+
+    /// Whether the character belongs to a word.  The rest of the
+    /// word fields are only valid if it does.
+    pub has_word: libc::boolean_t,
+    pub word: compat::WordId,
+
+    /// The state of the word after the keystroke.
+    pub touched: libc::boolean_t,
+    pub behind: libc::boolean_t,
+
+    /// Whether the word's touched or behind flag changed.
+    pub word_changed: libc::boolean_t,
+
+    /// Whether the last character of the text has been typed.
+    pub complete: libc::boolean_t,
+}
+
+/// Types the given character at the position in the buffer.
+///
+/// Records the typed character and whether it is correct, and marks
+/// the word as touched, or as behind if this is its last letter.
+/// What changed is written to dirty.  The state is updated in place,
+/// so the cost does not depend on the size of the state.
+///
+/// Returns a non-zero value if pos is out of range or codepoint is
+/// not a valid character.
+#[no_mangle()]
+pub unsafe fn speedtype_type_char(
+    state: *mut compat::State,
+    pos: libc::size_t,
+    codepoint: libc::uint32_t,
+    dirty: *mut Dirty,
+) -> libc::c_int {
+    let (buffer, words) = imp::as_slices(&mut *state);
+    let len = buffer.len();
+    if pos >= len || ::std::char::from_u32(codepoint).is_none() {
+        return 1;
+    }
+
+    let ch = &mut buffer[pos];
+    ch.has_typed = 1;
+    ch.typed = codepoint;
+    ch.correct = (ch.character == codepoint) as libc::boolean_t;
+    ch.rendered = 0;
+
+    let mut out = Dirty::default();
+    out.character = pos;
+    out.complete = (pos + 2 >= len) as libc::boolean_t;
+    if ch.has_word != 0 {
+        let word = &mut words[ch.word];
+        let last = *imp::characters(word).last().expect("word without letters");
+        let behind = (word.behind != 0 || pos == last) as libc::boolean_t;
+        out.word_changed = (word.touched == 0 || word.behind != behind) as libc::boolean_t;
+        word.touched = 1;
+        word.behind = behind;
+        imp::describe_word(&mut out, word);
     }
+    *dirty = out;
+    0
+}
+
+/// Clears what was typed at the position in the buffer.
+///
+/// This is what happens to the character the caret moves back onto.
+/// The word it belongs to is no longer behind.  What changed is
+/// written to dirty.
+///
+/// Returns a non-zero value if pos is out of range.
+#[no_mangle()]
+pub unsafe fn speedtype_backspace(
+    state: *mut compat::State,
+    pos: libc::size_t,
+    dirty: *mut Dirty,
+) -> libc::c_int {
+    let (buffer, words) = imp::as_slices(&mut *state);
+    if pos >= buffer.len() {
+        return 1;
+    }
+
+    let ch = &mut buffer[pos];
+    ch.has_typed = 0;
+    ch.typed = 0;
+    ch.correct = 0;
+    ch.rendered = 0;
+
+    let mut out = Dirty::default();
+    out.character = pos;
+    if ch.has_word != 0 {
+        let word = &mut words[ch.word];
+        out.word_changed = word.behind;
+        word.behind = 0;
+        imp::describe_word(&mut out, word);
+    }
+    *dirty = out;
+    0
 }
 
 mod imp {
     use super::*;
-    use model::speedtype::strong::State as SpeedTypeState;
     use model::speedtype::strong::{Character, Sentence, Word};
 
-    pub fn process_line(state: &mut SpeedTypeState, line: &CStr) -> Result<()> {
-        let base_char_id = state.buffer.len();
-        let base_word_id = state.words.len();
+    /// Views the buffer and the words of the state as slices.
+    pub unsafe fn as_slices<'a>(
+        state: &'a mut compat::State,
+    ) -> (&'a mut [compat::Character], &'a mut [compat::Word]) {
+        (state.buffer.as_slice_mut(), state.words.as_slice_mut())
+    }
 
-        let line = line.to_str()?;
+    /// Gets the IDs of the letters of the word.
+    pub unsafe fn characters<'a>(word: &'a compat::Word) -> &'a [compat::CharacterId] {
+        if word.characters.len == 0 {
+            &[]
+        } else {
+            slice::from_raw_parts(word.characters.ptr, word.characters.len)
+        }
+    }
+
+    /// Records the state of the word in dirty.
+    pub fn describe_word(dirty: &mut Dirty, word: &compat::Word) {
+        dirty.has_word = 1;
+        dirty.word = word.id;
+        dirty.touched = word.touched;
+        dirty.behind = word.behind;
+    }
+
+    /// Appends the characters, words and sentence of the line.
+    pub fn process_line(
+        buffer: &mut Vec<compat::Character>,
+        words_out: &mut Vec<compat::Word>,
+        sentences: &mut Vec<compat::Sentence>,
+        line: &str,
+    ) {
+        let base_char_id = buffer.len();
+        let base_word_id = words_out.len();
 
         let mut buf = vec![];
         let mut words = vec![];
@@ -91,12 +248,8 @@ mod imp {
         let id = base_char_id + buf.len();
         buf.push(Character::with_id_and_char(id, '\n'));
 
-        state
-            .sentences
-            .push(Sentence(words.iter().map(|word| word.id).collect()));
-        state.buffer.append(&mut buf);
-        state.words.append(&mut words);
-
-        Ok(())
+        sentences.push(Sentence(words.iter().map(|word| word.id).collect()).into());
+        buffer.extend(buf.into_iter().map(compat::Character::from));
+        words_out.extend(words.into_iter().map(compat::Word::from));
     }
 }
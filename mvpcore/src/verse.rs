@@ -1,6 +1,6 @@
 use capi::{self, Result};
 use dirs;
-use libc::{c_char, c_int};
+use libc::{c_char, c_int, size_t};
 use model::compat::Verse;
 use model::strong;
 use regex::Regex;
@@ -12,6 +12,10 @@ use sdb::Sdb;
 use sqlite3;
 use std::ffi::{CStr, CString};
 use std::fmt::{self, Display, Formatter};
+use std::collections::VecDeque;
+use std::slice;
+#[cfg(feature = "cache_uses_sdb")]
+use std::vec;
 
 #[cfg(feature = "cache_uses_sqlite")]
 const DB_EXT: &str = ".db";
@@ -48,6 +52,27 @@ impl VerseView {
     }
 }
 
+/// Walks the verses of a translation a batch at a time, unlike
+/// VerseView which holds at most 176 verses of fixed length.
+///
+/// The verses are read from the database a page at a time, as the
+/// batches ask for them.  A verse that did not fit in the last batch
+/// stays at the front of verses for the next one.
+pub struct VerseCursor {
+    pages: imp::Pages,
+    verses: VecDeque<(String, String)>,
+}
+
+/// Locates a verse read by verse_cursor_next() in the buffer, as the
+/// offsets and lengths in bytes of its key and text.
+#[repr(C)]
+pub struct VerseSlice {
+    key: size_t,
+    key_len: size_t,
+    text: size_t,
+    text_len: size_t,
+}
+
 #[derive(Clone, Copy, PartialEq)]
 #[repr(C)]
 pub enum VerseSource {
@@ -135,6 +160,69 @@ pub unsafe fn verse_find_all(translation: *const c_char, view: *mut VerseView) -
     }
 }
 
+/// Opens a cursor over the verses of the translation that are not
+/// deleted, and stores it in *cursor.  The cursor must be freed with
+/// verse_cursor_close().
+#[no_mangle]
+pub unsafe fn verse_cursor_open(translation: *const c_char, cursor: *mut *mut VerseCursor) -> c_int {
+    let translation = CStr::from_ptr(translation);
+    match imp::verse_cursor_open(translation) {
+        Ok(pages) => {
+            let verses = VecDeque::new();
+            *cursor = Box::into_raw(Box::new(VerseCursor { pages, verses }));
+            0
+        }
+        Err(e) => {
+            eprintln!("{:?}", e);
+            capi::map_error_to_code(&e) as c_int
+        }
+    }
+}
+
+/// Reads the next batch of verses from the cursor.
+///
+/// Caller passes the capacities of slices and buf in *slices_len and
+/// *buf_len.  As many verses as fit in both are copied into buf, the
+/// key followed by the text, and located in slices.  Then *slices_len
+/// is set to the number of verses read, which is 0 once the cursor is
+/// exhausted, and *buf_len to the bytes used.
+///
+/// If the next verse does not fit in buf on its own, returns
+/// SessionBufferTooSmall and sets *buf_len to the size needed.
+#[no_mangle]
+pub unsafe fn verse_cursor_next(
+    cursor: *mut VerseCursor,
+    slices: *mut VerseSlice,
+    slices_len: *mut size_t,
+    buf: *mut u8,
+    buf_len: *mut size_t,
+) -> c_int {
+    let cursor = &mut *cursor;
+    let slices = slice::from_raw_parts_mut(slices, *slices_len);
+    let buf = slice::from_raw_parts_mut(buf, *buf_len);
+    match imp::verse_cursor_next(cursor, slices, buf) {
+        Ok((count, used)) => {
+            *slices_len = count;
+            *buf_len = used;
+            0
+        }
+        Err(e) => {
+            if let Some((key, text)) = cursor.verses.front() {
+                *buf_len = key.len() + text.len();
+            }
+            capi::map_error_to_code(&e) as c_int
+        }
+    }
+}
+
+/// Frees the cursor opened by verse_cursor_open().
+#[no_mangle]
+pub unsafe fn verse_cursor_close(cursor: *mut VerseCursor) {
+    if !cursor.is_null() {
+        drop(Box::from_raw(cursor));
+    }
+}
+
 #[no_mangle]
 pub unsafe fn verse_find_by_book_and_chapter(
     translation: *const c_char,
@@ -240,6 +328,157 @@ mod imp {
         Ok(())
     }
 
+    /// Reads the verses of a translation a page at a time.
+    ///
+    /// The statement borrows the connection, so it cannot be kept
+    /// with it.  Each page is a query of its own instead, which
+    /// carries on after the last row read.
+    #[cfg(feature = "cache_uses_sqlite")]
+    pub struct Pages {
+        connection: sqlite3::Connection,
+        last_rowid: i64,
+    }
+
+    #[cfg(feature = "cache_uses_sqlite")]
+    impl Pages {
+        /// Reads up to limit verses following the last page.  An empty
+        /// page means the verses have run out.
+        fn next_page(&mut self, limit: usize) -> Result<Vec<(String, String)>> {
+            let mut cursor = self
+                .connection
+                .prepare(
+                    "SELECT rowid, key, text FROM verse \
+                     WHERE deleted = 0 AND rowid > ? ORDER BY rowid LIMIT ?",
+                )?
+                .cursor();
+            cursor.bind(&[
+                sqlite3::Value::Integer(self.last_rowid),
+                sqlite3::Value::Integer(limit as i64),
+            ])?;
+
+            let mut verses = vec![];
+            while let Some(row) = cursor.next()? {
+                self.last_rowid = row[0].as_integer().expect("column rowid expected");
+                verses.push((
+                    row[1].as_string().expect("column key expected").to_owned(),
+                    row[2].as_string().expect("column text expected").to_owned(),
+                ));
+            }
+            Ok(verses)
+        }
+    }
+
+    /// Reads the verses of a translation a page at a time.
+    ///
+    /// sdb cannot select a range of records, so they are all read when
+    /// the cursor is opened, and handed out a page at a time.
+    #[cfg(feature = "cache_uses_sdb")]
+    pub struct Pages {
+        records: vec::IntoIter<(String, String)>,
+    }
+
+    #[cfg(feature = "cache_uses_sdb")]
+    impl Pages {
+        /// Takes up to limit verses following the last page.  An empty
+        /// page means the verses have run out.
+        fn next_page(&mut self, limit: usize) -> Result<Vec<(String, String)>> {
+            Ok(self.records.by_ref().take(limit).collect())
+        }
+    }
+
+    #[cfg(feature = "cache_uses_sqlite")]
+    pub fn verse_cursor_open(translation: &CStr) -> Result<Pages> {
+        let mut dbpath = dirs::data_dir().expect("unable to get platform's data directory.");
+        dbpath.push("mvp-speedtype");
+        if !dbpath.exists() {
+            fs::create_dir(&dbpath)?;
+        }
+
+        let translation = translation.to_str()?;
+        dbpath.push(&(translation.to_owned() + DB_EXT));
+        let dbpath = dbpath.to_str().expect("failed to convert path to string");
+
+        let connection = sqlite3::open(&dbpath)?;
+        Ok(Pages {
+            connection,
+            last_rowid: 0,
+        })
+    }
+
+    #[cfg(feature = "cache_uses_sdb")]
+    pub fn verse_cursor_open(translation: &CStr) -> Result<Pages> {
+        let mut dbpath = dirs::data_dir().expect("unable to get platform's data directory.");
+        dbpath.push("mvp-speedtype");
+        if !dbpath.exists() {
+            fs::create_dir(&dbpath)?;
+        }
+
+        let translation = translation.to_str()?;
+        dbpath.push(&(translation.to_owned() + DB_EXT));
+        let dbpath = dbpath.to_str().expect("failed to convert path to string");
+
+        let mut sdb = Sdb::open(&dbpath)?;
+        let verse_table = sdb
+            .tables_mut()
+            .iter_mut()
+            .filter(|table| !table.is_dropped())
+            .find(|table| table.name() == "verse")
+            .expect("verse table");
+        verse_table.create_manager()?;
+        let manager = verse_table.manager_mut().expect("manager");
+        manager.verify()?;
+        manager.service()?;
+        let records: Vec<_> = manager
+            .select_all()?
+            .iter()
+            .filter(|rec| rec["deleted"] == "0")
+            .map(|rec| (rec["key"].clone(), rec["text"].clone()))
+            .collect();
+        Ok(Pages {
+            records: records.into_iter(),
+        })
+    }
+
+    pub fn verse_cursor_next(
+        cursor: &mut VerseCursor,
+        slices: &mut [VerseSlice],
+        buf: &mut [u8],
+    ) -> Result<(usize, usize)> {
+        let mut count = 0;
+        let mut used = 0;
+        while count < slices.len() {
+            if cursor.verses.is_empty() {
+                let page = cursor.pages.next_page(slices.len() - count)?;
+                cursor.verses.extend(page);
+            }
+            let fits = match cursor.verses.front() {
+                Some((key, text)) => used + key.len() + text.len() <= buf.len(),
+                None => break,
+            };
+            if !fits {
+                if count == 0 {
+                    return Err(capi::CapiError::BufferTooSmall);
+                }
+                break;
+            }
+
+            let (key, text) = cursor.verses.pop_front().expect("peeked verse");
+            let text_start = used + key.len();
+            let end = text_start + text.len();
+            buf[used..text_start].copy_from_slice(key.as_bytes());
+            buf[text_start..end].copy_from_slice(text.as_bytes());
+            slices[count] = VerseSlice {
+                key: used,
+                key_len: key.len(),
+                text: text_start,
+                text_len: text.len(),
+            };
+            used = end;
+            count += 1;
+        }
+        Ok((count, used))
+    }
+
     #[cfg(feature = "cache_uses_sqlite")]
     pub fn verse_find_by_book_and_chapter(
         translation: &CStr,
@@ -1,8 +1,14 @@
-from dataentry import DataEntryForm
-from flashcard import FlashCardForm
-from speedtype import SpeedTypeForm
+import config
+import importlib
+from lru import LruCache
+from PyQt5 import QtWidgets
 
-FORM_TYPES = [FlashCardForm, DataEntryForm, SpeedTypeForm]
+"""Modules and classes of the forms.  A form's module is only imported
+when the form is first shown, so starting up does not wait for the
+other forms."""
+FORM_TYPES = [('flashcard', 'FlashCardForm'),
+              ('dataentry', 'DataEntryForm'),
+              ('speedtype', 'SpeedTypeForm')]
 
 FLASH_CARD_INDEX = 0
 DATA_ENTRY_INDEX = 1
@@ -10,6 +16,10 @@ SPEED_TYPE_INDEX = 2
 
 INIT_FORM_INDEX = SPEED_TYPE_INDEX
 
+"""Estimated size in bytes of a form that does not estimate its own
+with a footprint() method."""
+FORM_BYTES = 2 * 1024 * 1024
+
 def init_screens():
     """initialises the screens created using the given form types."""
     global current_form_index
@@ -18,18 +28,65 @@ def init_screens():
     global form_types
     form_types = FORM_TYPES
 
+    # forms hidden by switch_to(), kept to be shown again.
+    global idle_forms
+    idle_forms = LruCache(config.FORM_CACHE_BYTES, _footprint, _dispose)
+    QtWidgets.QApplication.instance().aboutToQuit.connect(_dispose_idle)
+
     global form
-    form = form_types[current_form_index]()
+    form = _form_type(current_form_index)()
     form.gui.show()
 
 def switch_to(form_index):
-    global current_form_index
-    current_form_index = form_index
+    """Hides the current form and shows the form at the index.
+
+    The hidden form is kept idle rather than destroyed, so switching
+    back shows it as it was.  Forms may define suspend() and resume(),
+    which are called when they are hidden and shown again.  Idle forms
+    are destroyed once they are estimated to take up more than
+    config.FORM_CACHE_BYTES.
 
+    """
+    global current_form_index
     global form
+    if form_index == current_form_index:
+        return
+
+    if hasattr(form, 'suspend'):
+        form.suspend()
     form.gui.hide()
-    form.gui.close()
-    form.gui.destroy(True, True)
+    idle_forms.put(current_form_index, form)
 
-    form = form_types[current_form_index]()
+    current_form_index = form_index
+    form = idle_forms.get(current_form_index)
+    if form is None:
+        form = _form_type(current_form_index)()
+    else:
+        idle_forms.discard(current_form_index)
+        if hasattr(form, 'resume'):
+            form.resume()
     form.gui.show()
+
+def _form_type(form_index):
+    """Imports the module of the form if need be, and returns the
+    form's class."""
+    (module, name) = form_types[form_index]
+    return getattr(importlib.import_module(module), name)
+
+def _footprint(form_index, idle):
+    if hasattr(idle, 'footprint'):
+        return idle.footprint()
+    else:
+        return FORM_BYTES
+
+def _dispose(form_index, idle):
+    """Destroys the idle form."""
+    idle.gui.close()
+    idle.gui.destroy(True, True)
+
+def _dispose_idle():
+    """Destroys the idle forms, giving them the chance to save their
+    state as they close."""
+    for (form_index, idle) in idle_forms.items():
+        _dispose(form_index, idle)
+    idle_forms.clear()
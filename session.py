@@ -1,9 +1,44 @@
 # coding: utf-8
-""" Stores and loads the session """
+""" Stores and loads the session
 
+The session is kept in a binary snapshot, SESSION_FILE, encoded by the
+snapshot module.  The keystrokes since the snapshot are appended to a
+journal.  Every snapshot starts a new generation of the journal, and
+records the generation it starts.  Loading the session reads the
+journals of that generation onwards, for the caller to replay on top
+of the snapshot.
+
+Sessions stored in JSON by earlier versions, LEGACY_SESSION_FILE, are
+still loaded.
+
+"""
+
+import glob
 import json
+import os
+import snapshot
+import struct
+import threading
+import time
+
+SESSION_FILE = 'session.snapshot'
+LEGACY_SESSION_FILE = 'session.json'
+
+"""The journals are named after the generation, e.g. session.journal.3"""
+JOURNAL_PREFIX = 'session.journal.'
+
+"""Number of keystrokes in the journal after which a new snapshot is
+due."""
+COMPACT_RECORDS = 2000
+
+"""Number of difficulty levels.  A session's level is from 0 up to,
+but not including, this."""
+LEVEL_COUNT = 5
+
+# the generation of the latest snapshot written or loaded.
+_snapshot_generation = -1
 
-SESSION_FILE = 'session.json'
+_writer = None
 
 class InvalidSessionError(Exception):
     """Indicates the session data found in the session file was corrupt or
@@ -38,30 +73,290 @@ def init():
     }
 
 def store(session):
-    """Persists the session on disk"""
-    with open(SESSION_FILE, 'w') as f:
-        json.dump(session, f, indent=2)
+    """Persists the session on disk
+
+    The snapshot is written to a temporary file, synced to the disk,
+    and then put in place of the old one, so that a crash leaves
+    either the old or the new snapshot behind.
+
+    """
+    temp = SESSION_FILE + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(snapshot.dumps(session))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, SESSION_FILE)
 
 def load():
-    """Reads the session from disk"""
+    """Reads the session from disk
+
+    The keystrokes journaled since the snapshot are listed in
+    progress['journal'], as ('t', pos, char) for typing and
+    ('b', pos) for erasing, in the order they happened.
+
+    """
     try:
-        with open(SESSION_FILE, 'r') as f:
-            session = json.load(f)
+        session = _load_snapshot()
     except FileNotFoundError:
+        session = _load_legacy()
+    if session is None:
         return None
-    except json.decoder.JSONDecodeError:
-        raise InvalidSessionError()
 
     if _validate(session):
+        global _snapshot_generation
+        _snapshot_generation = max(_snapshot_generation,
+                                   session.get('journal', -1))
+        if session['progress'] is not None:
+            session['progress']['journal'] = \
+                _read_journals(session.get('journal', 0))
         return session
     else:
         raise InvalidSessionError()
 
+def current_file():
+    """Returns the file the session is loaded from."""
+    if os.path.exists(SESSION_FILE) or \
+       not os.path.exists(LEGACY_SESSION_FILE):
+        return SESSION_FILE
+    else:
+        return LEGACY_SESSION_FILE
+
+def valid_level(level):
+    """Checks if the level, an int or a string, is a difficulty level."""
+    try:
+        return 0 <= int(level) < LEVEL_COUNT
+    except (TypeError, ValueError):
+        return False
+
+def _load_snapshot():
+    with open(SESSION_FILE, 'rb') as f:
+        data = f.read()
+    try:
+        return snapshot.loads(data)
+    except (snapshot.SnapshotError, struct.error, ValueError) as e:
+        raise InvalidSessionError(e)
+
+def _load_legacy():
+    try:
+        with open(LEGACY_SESSION_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.decoder.JSONDecodeError:
+        raise InvalidSessionError()
+
+class Journal:
+    """Appends the keystrokes of a session to a journal file.
+
+    Each record is a short line of text written straight to the file,
+    so that a crash of the process loses at most the record being
+    written.  The records are synced to the disk when the journal is
+    closed, which a new snapshot does within MAX_SNAPSHOT_STALENESS
+    of the first keystroke, so a crash of the system loses at most the
+    keystrokes of that long.
+
+    """
+    def __init__(self, generation):
+        self.generation = generation
+        self.records = 0
+        self._fd = os.open(_journal_path(generation),
+                           os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def typed(self, pos, char):
+        """Records that char was typed at pos."""
+        self._append('t {0} {1}\n'.format(pos, ord(char)))
+
+    def erased(self, pos):
+        """Records that what was typed at pos was erased."""
+        self._append('b {0}\n'.format(pos))
+
+    def close(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    def _append(self, record):
+        os.write(self._fd, record.encode('ascii'))
+        self.records += 1
+
+def compact(session, journal):
+    """Takes a snapshot of the session and starts a new journal.
+
+    The snapshot is written in the background, after which the older
+    journals are removed.  The keystrokes recorded in the old journal
+    are expected to be in the session already.  Returns the new
+    journal, and closes the old one if there is one.
+
+    """
+    generation = _next_generation()
+    if journal is not None:
+        journal.close()
+    new_journal = Journal(generation)
+
+    copy = dict(session)
+    copy['journal'] = generation
+    _get_writer().submit(copy, generation)
+    return new_journal
+
+def flush():
+    """Waits for the snapshots being written in the background."""
+    if _writer is not None:
+        _writer.flush()
+
+def writer_stats():
+    """Returns the counters and timings of writing the snapshots."""
+    if _writer is not None:
+        return _writer.stats()
+    else:
+        # nothing written yet.
+        return {
+            'submitted': 0,
+            'written': 0,
+            'coalesced': 0,
+            'last_write_ms': 0.0,
+            'max_write_ms': 0.0,
+            'mean_write_ms': 0.0,
+            'last_flush_ms': 0.0,
+        }
+
+class SnapshotWriter(threading.Thread):
+    """Writes the snapshots of the session in the background.
+
+    Only the latest snapshot submitted is kept.  If another one comes
+    in while a snapshot is being written, the one waiting is replaced,
+    so a burst of snapshots is written once.
+
+    """
+    def __init__(self):
+        super(SnapshotWriter, self).__init__(daemon=True)
+        self._cond = threading.Condition()
+        self._waiting = None
+        self._writing = False
+
+        self.submitted = 0
+        self.written = 0
+        self.coalesced = 0
+        self.last_write = 0.0
+        self.max_write = 0.0
+        self.total_write = 0.0
+        self.last_flush = 0.0
+
+    def submit(self, session, generation):
+        with self._cond:
+            if self._waiting is not None:
+                self.coalesced += 1
+            self._waiting = (session, generation)
+            self.submitted += 1
+            self._cond.notify_all()
+
+    def flush(self):
+        """Waits until the snapshots submitted so far are written."""
+        start = time.perf_counter()
+        with self._cond:
+            while self._waiting is not None or self._writing:
+                self._cond.wait()
+        self.last_flush = time.perf_counter() - start
+
+    def stats(self):
+        """Returns the counters, and the timings in milliseconds."""
+        with self._cond:
+            return {
+                'submitted': self.submitted,
+                'written': self.written,
+                'coalesced': self.coalesced,
+                'last_write_ms': self.last_write * 1e3,
+                'max_write_ms': self.max_write * 1e3,
+                'mean_write_ms': self.total_write * 1e3 / self.written
+                                 if self.written > 0 else 0.0,
+                'last_flush_ms': self.last_flush * 1e3,
+            }
+
+    def run(self):
+        global _snapshot_generation
+        while True:
+            with self._cond:
+                while self._waiting is None:
+                    self._cond.wait()
+                (session, generation) = self._waiting
+                self._waiting = None
+                self._writing = True
+
+            start = time.perf_counter()
+            try:
+                store(session)
+                _snapshot_generation = max(_snapshot_generation, generation)
+                for (old, path) in _journals():
+                    if old < generation:
+                        os.remove(path)
+            except OSError as e:
+                # the journals are kept, so nothing is lost.
+                print('failed to store session', e)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._cond:
+                    self._writing = False
+                    self.written += 1
+                    self.last_write = elapsed
+                    self.max_write = max(self.max_write, elapsed)
+                    self.total_write += elapsed
+                    self._cond.notify_all()
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        _writer = SnapshotWriter()
+        _writer.start()
+    return _writer
+
+def _read_journals(first):
+    """Reads the records of the journals from the generation first
+    onwards."""
+    records = []
+    for (generation, path) in _journals():
+        if generation < first:
+            continue
+
+        with open(path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                try:
+                    if fields[0] == 't' and len(fields) == 3:
+                        records.append(('t', int(fields[1]),
+                                        chr(int(fields[2]))))
+                    elif fields[0] == 'b' and len(fields) == 2:
+                        records.append(('b', int(fields[1])))
+                except (IndexError, ValueError):
+                    # a record cut short by a crash.
+                    pass
+    return records
+
+def _journals():
+    """Returns the generations and paths of the journals on disk, in
+    order."""
+    journals = []
+    for path in glob.glob(JOURNAL_PREFIX + '*'):
+        suffix = path[len(JOURNAL_PREFIX):]
+        if suffix.isdigit():
+            journals.append((int(suffix), path))
+    return sorted(journals)
+
+def _journal_path(generation):
+    return JOURNAL_PREFIX + str(generation)
+
+def _next_generation():
+    journals = _journals()
+    latest = journals[-1][0] if len(journals) > 0 else -1
+    return max(latest, _snapshot_generation) + 1
+
 def _validate(session):
-    """Validates the session objects.  Checks if all attributes are there."""
+    """Validates the session objects.  Checks if all attributes are
+    there, and the level is in range."""
     for attr in ['name', 'range', 'level', 'strategy', 'progress']:
         if not attr in session:
             return False
+    if not valid_level(session['level']):
+        return False
     for attr in ['start', 'end']:
         if not attr in session['range']:
             return False
@@ -8,6 +8,11 @@ class SimpleLayout:
     def set_line_width(self, lw):
         self.line_width = lw
 
+    def cache_key(self):
+        """Identifies the engine and the parameters its layout depends
+        on."""
+        return ('SimpleLayout', self.line_width)
+
     def layout(self, text):
         retval = []
         while len(text) > 0:
@@ -0,0 +1,164 @@
+# coding: utf-8
+"""Encodes the session in a compact, versioned binary snapshot.
+
+Most of the speedtype state can be worked out again from the verses and
+the layout, so the snapshot holds only what cannot: the session itself,
+the layout parameters, and the progress of each character and word as
+bit-packed columns.  Characters typed correctly are the characters of
+the text, so only the codepoints of the mistyped ones are stored.
+
+The snapshot is laid out as:
+
+    magic, version, header length   HEADER
+    header                          JSON, UTF-8
+    character count, word count     COUNTS
+    visible, has_typed, correct     a bit per character each
+    word_visible, touched, behind   a bit per word each
+    mismatch count                  COUNT
+    positions, codepoints           little-endian uint32 each
+
+The header holds the session without its progress, and the progress
+without its columns.
+
+"""
+
+import json
+import struct
+
+MAGIC = b'MVPS'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHI')
+COUNTS = struct.Struct('<II')
+COUNT = struct.Struct('<I')
+
+CHARACTER_COLUMNS = ['visible', 'has_typed', 'correct']
+WORD_COLUMNS = ['word_visible', 'touched', 'behind']
+
+"""Keys the progress in the header must have for the session to be
+restored from it."""
+PROGRESS_KEYS = ['caret', 'title', 'layout', 'loaded', 'missing']
+
+class SnapshotError(Exception):
+    """Indicates the snapshot is not one this version can read."""
+    pass
+
+def dumps(session):
+    """Encodes the session.  Its progress, if any, holds the columns
+    returned by bridge.speedtype.State.progress_columns()."""
+    import numpy as np
+
+    header = dict(session)
+    progress = session['progress']
+    columns = None
+    if progress is not None:
+        columns = progress['columns']
+        header['progress'] = {key: value for (key, value) in progress.items()
+                              if key != 'columns'}
+
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf8')
+    parts = [HEADER.pack(MAGIC, VERSION, len(encoded)), encoded]
+
+    if columns is not None:
+        parts.append(COUNTS.pack(len(columns['visible']),
+                                 len(columns['word_visible'])))
+        for name in CHARACTER_COLUMNS + WORD_COLUMNS:
+            parts.append(np.packbits(columns[name]).tobytes())
+
+        mismatches = np.flatnonzero(columns['has_typed'] & ~columns['correct'])
+        parts.append(COUNT.pack(len(mismatches)))
+        parts.append(mismatches.astype('<u4').tobytes())
+        parts.append(columns['typed'][mismatches].astype('<u4').tobytes())
+
+    return b''.join(parts)
+
+def loads(data):
+    """Decodes the session encoded by dumps().
+
+    The codepoints typed correctly are not in the snapshot, so the
+    typed column only holds the mismatches.  fill_typed() completes
+    it once the text is known.
+
+    Raises SnapshotError if the data is not a whole snapshot, e.g. if
+    the file was truncated or damaged.
+
+    """
+    import numpy as np
+
+    _check_size(data, 0, HEADER.size)
+    (magic, version, length) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise SnapshotError('not a session snapshot')
+    if version != VERSION:
+        raise SnapshotError('unsupported snapshot version {0}'.format(version))
+
+    offset = HEADER.size
+    _check_size(data, offset, length)
+    try:
+        session = json.loads(data[offset:offset + length].decode('utf8'))
+    except ValueError as e:
+        raise SnapshotError('invalid header: {0}'.format(e))
+    offset += length
+    _check_header(session)
+
+    progress = session['progress']
+    if progress is not None:
+        _check_size(data, offset, COUNTS.size)
+        (char_count, word_count) = COUNTS.unpack_from(data, offset)
+        offset += COUNTS.size
+
+        columns = {}
+        for (names, count) in [(CHARACTER_COLUMNS, char_count),
+                               (WORD_COLUMNS, word_count)]:
+            size = (count + 7) // 8
+            _check_size(data, offset, size * len(names))
+            for name in names:
+                packed = np.frombuffer(data, np.uint8, size, offset)
+                columns[name] = np.unpackbits(packed, count=count) \
+                                  .astype(bool)
+                offset += size
+
+        _check_size(data, offset, COUNT.size)
+        (mismatch_count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        _check_size(data, offset, 2 * 4 * mismatch_count)
+        positions = np.frombuffer(data, '<u4', mismatch_count, offset)
+        offset += positions.nbytes
+        codepoints = np.frombuffer(data, '<u4', mismatch_count, offset)
+        if mismatch_count > 0 and positions.max() >= char_count:
+            raise SnapshotError('mismatch past the last character')
+
+        typed = np.zeros(char_count, np.uint32)
+        typed[positions] = codepoints
+        columns['typed'] = typed
+        progress['columns'] = columns
+
+    return session
+
+def _check_header(session):
+    if not isinstance(session, dict) or 'progress' not in session:
+        raise SnapshotError('header without progress')
+    progress = session['progress']
+    if progress is None:
+        return
+    if not isinstance(progress, dict):
+        raise SnapshotError('invalid progress')
+    for key in PROGRESS_KEYS:
+        if key not in progress:
+            raise SnapshotError('progress without {0}'.format(key))
+
+def _check_size(data, offset, size):
+    """Raises SnapshotError unless data holds size bytes from offset."""
+    if offset + size > len(data):
+        raise SnapshotError('snapshot truncated at {0} of {1} bytes'
+                            .format(len(data), offset + size))
+
+def fill_typed(columns, characters):
+    """Fills in the codepoints of the characters typed correctly.
+
+    characters is the codepoint of each character of the text, e.g.
+    the character field of State.characters_array().
+
+    """
+    hits = columns['has_typed'] & columns['correct']
+    columns['typed'][hits] = characters[hits]
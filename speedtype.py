@@ -7,18 +7,28 @@ more words are hidden.
 
 import bridge
 import config
+import graphlayout
 import model
 import os
+import queue
 import screen
 import session
+import snapshot
+import uicache
 from PyQt5 import Qt, QtCore, QtGui, QtWidgets
-from PyQt5 import uic
 from address import Address
+from bisect import bisect_right
 from caret import Caret
 from key import Key
-from random import randrange
 from sentence import sentences_cons2, sentences_index_by_verseno
 from graphlayout import GraphLayout
+from glyphrun import GlyphPainter
+from layoutcache import CachedLayout
+from collections import deque
+from contextlib import nullcontext
+from itertools import islice
+from latency import LatencyRecorder
+from lineindex import LineIndex
 
 Level1 = {
     'hidden_words': 0.0,
@@ -42,9 +52,36 @@ Level5 = {
 
 Levels = [Level1, Level2, Level3, Level4, Level5]
 
+"""Number of lines in a block of the canvas.  Blocks are the unit in
+which a virtual canvas evicts and restores what it has rendered."""
+BLOCK_LINES = 20
+
+"""Number of sentences a SentenceLoader hands over at a time."""
+MATERIALIZE_BATCH = 8
+
+"""How far, in viewport heights, a virtual canvas keeps text rendered
+above and below the viewport."""
+VIEWPORT_MARGIN = 1
+
+"""A virtual canvas lays out more text once the caret gets this close
+to the end of the text laid out so far."""
+MATERIALIZE_AHEAD = 200
+
+MISSING_TEXT = 'The text is missing for the selected verses.  ' + \
+    'Please enter the text in the enter verses screen, ' + \
+    'or edit the current session.'
+
+"""Milliseconds between updates of the latency overlay."""
+LATENCY_OVERLAY_INTERVAL = 500
+
+"""Estimated size in bytes of each character of the text across the
+native state, the records and the render, on top of the form itself,
+for screen.switch_to() to bound the memory idle forms take up."""
+CHARACTER_BYTES = 1024
+
 window = None
 
-UiMainWindow, QMainWindow = uic.loadUiType('speedtype.ui')
+UiMainWindow, QMainWindow = uicache.load_ui_type('speedtype.ui')
 
 class SpeedTypeForm(UiMainWindow, QMainWindow):
     """ main form for the speed type tutor style memorisation """
@@ -64,10 +101,12 @@ class SpeedTypeForm(UiMainWindow, QMainWindow):
         self.action_edit_session.triggered.connect(self._edit_session)
         self.action_debug_inspect_database.triggered.connect(_debug_view_db)
         self.action_debug_sentences.triggered.connect(_debug_sentences)
+        self.action_debug_latency.toggled.connect(self._show_latency)
+        self.action_debug_verse_cache.triggered.connect(_debug_verse_cache)
 
         self.difficulty_level.valueChanged.connect(self._difficulty_level_changed)
 
-        self.canvas = SpeedTypeCanvas(GraphLayout())
+        self.canvas = SpeedTypeCanvas(CachedLayout(GraphLayout()))
         layout = QtWidgets.QVBoxLayout(self.speedtype)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.addWidget(self.canvas)
@@ -75,6 +114,25 @@ class SpeedTypeForm(UiMainWindow, QMainWindow):
 
         self.title.setFont(QtGui.QFont(config.FONT_FAMILY, 20))
 
+        self.latency_overlay = None
+        self.latency_timer = None
+
+    def suspend(self):
+        """Called by screen when another form is shown instead."""
+        if self.latency_timer is not None:
+            self.latency_timer.stop()
+        self.canvas.suspend()
+
+    def resume(self):
+        """Called by screen when the form is shown again."""
+        self.canvas.resume()
+        if self.latency_timer is not None:
+            self.latency_timer.start()
+
+    def footprint(self):
+        """Estimates the memory in bytes the form takes up."""
+        return screen.FORM_BYTES + CHARACTER_BYTES * len(self.canvas.state.buf() or [])
+
     def _difficulty_level_changed(self, value):
         """called when user changes the difficulty level by manipulating the
         slider
@@ -86,6 +144,51 @@ class SpeedTypeForm(UiMainWindow, QMainWindow):
         """Calls the speed type widget's edit_session method."""
         self.canvas.edit_session()
 
+    def _show_latency(self, checked):
+        """Shows or hides the typing latency over the canvas.
+
+        Showing the overlay turns on measuring the latency if it is not
+        on already.
+
+        """
+        if checked:
+            if self.canvas.latency is None:
+                self.canvas.latency = LatencyRecorder()
+
+            self.latency_overlay = QtWidgets.QLabel(self.scroll_area)
+            self.latency_overlay.setFont(QtGui.QFont(config.FONT_FAMILY, 11))
+            self.latency_overlay.setStyleSheet(
+                'background-color: rgba(255, 255, 224, 224); padding: 4px')
+            self.latency_overlay.setAttribute(
+                QtCore.Qt.WA_TransparentForMouseEvents)
+            self.latency_overlay.show()
+
+            self.latency_timer = Qt.QTimer(self)
+            self.latency_timer.setInterval(LATENCY_OVERLAY_INTERVAL)
+            self.latency_timer.timeout.connect(self._update_latency)
+            self.latency_timer.start()
+            self._update_latency()
+        else:
+            self.latency_timer.stop()
+            self.latency_overlay.deleteLater()
+            self.latency_timer = None
+            self.latency_overlay = None
+
+    @Qt.pyqtSlot()
+    def _update_latency(self):
+        stats = session.writer_stats()
+        self.latency_overlay.setText(
+            self.canvas.latency.text() + '\n\n' +
+            'snapshots {0} written, {1} coalesced\n'.format(
+                stats['written'], stats['coalesced']) +
+            'write ms {0:.2f} last, {1:.2f} max\n'.format(
+                stats['last_write_ms'], stats['max_write_ms']) +
+            'flush ms {0:.2f} last'.format(stats['last_flush_ms']))
+        self.latency_overlay.adjustSize()
+        self.latency_overlay.move(
+            self.scroll_area.viewport().width() -
+            self.latency_overlay.width(), 0)
+
     def closeEvent(self, event):
         """Makes sure the session is stored before exiting."""
         self.canvas.persist_on_exit()
@@ -113,22 +216,31 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
 
         # describes how to render the canvas.
         self.render = {
-            # 2D lists of letters, their colours and Cartesian
-            # coordinates.  Each inner array corresponds to a line.
-            'letters': [],
-
             'caret': None,
             'line_spacing': 30,
             'background': QtGui.QColor(config.COLOURS['background']),
             'font': font,
             'fm': fm,
 
-            # Build the table of y coord to a pair of letters.  The first
-            # one is the letter that we should start painting if y is the
-            # beginning of clip region.  The second one is the letter that
-            # we should stop drawing if y is the end of clip region.
-            'cliptable': None,
-            'ct_info': None,
+            # paints the letters in runs of the same colour.
+            'glyphs': GlyphPainter(font),
+
+            # where the next character goes when text is appended.
+            'end': (0, 0),
+
+            # runs of BLOCK_LINES lines, with their buffer ranges and
+            # extents.  A resident block also has the letters of its
+            # characters, with their colours and coordinates, None for
+            # newlines; the coordinates of its characters, which is
+            # where the caret goes; and a LineIndex of its letters,
+            # used to paint only what is necessary.  A virtual canvas
+            # drops these for blocks far from the viewport.
+            'blocks': [],
+
+            # the first character and the top of each block, to look
+            # the blocks up by either.
+            'starts': [],
+            'tops': [],
             'fontheight': fm.height(),
         }
 
@@ -141,14 +253,44 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         # list of indices to words that belong to each sentence.
         self.sentences = []
 
+        # sentences that are not laid out yet, and their estimated
+        # total height.
+        self.pending = deque()
+        self.pending_height = 0
+
+        # the number of sentences of the session laid out so far, and
+        # whether the text of the session is missing, in which case a
+        # message is shown instead.
+        self.loaded = 0
+        self.missing = False
+
+        # lays out the pending sentences in the background; all of them,
+        # or if the canvas is virtual, those that come near the
+        # viewport.
+        self.loader = None
+
+        # measures typing latency, if asked for.
+        if config.LATENCY_REPORT is not None:
+            self.latency = LatencyRecorder()
+        else:
+            self.latency = None
+
         # a cache for font metrics for letters.
         self.fmcache = {}
 
-        # timer to persist the session and user's progress.
-        self.persist_timer = Qt.QTimer(self)
-        self.persist_timer.setSingleShot(True)
-        self.persist_timer.setInterval(config.PERSIST_INTERVAL)
-        self.persist_timer.timeout.connect(self.persist_session)
+        # records the keystrokes since the last snapshot of the
+        # session, and the length of the text in that snapshot, which
+        # is all the journal can be replayed onto.
+        self.journal = None
+        self.snapshot_buflen = 0
+
+        # takes a snapshot at most MAX_SNAPSHOT_STALENESS after the
+        # first keystroke since the last one.  Unlike a timer that
+        # restarts on every keystroke, typing cannot hold it off.
+        self.snapshot_timer = Qt.QTimer(self)
+        self.snapshot_timer.setSingleShot(True)
+        self.snapshot_timer.setInterval(config.MAX_SNAPSHOT_STALENESS)
+        self.snapshot_timer.timeout.connect(self.persist_session)
 
         self.engine = layout_engine
 
@@ -156,9 +298,8 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         loc = self.session['range']['start']
         self.set_title(' '.join([loc['book'], str(loc['chapter'])]) +
                        ' (' + config.translation.upper() + ')')
-        self.set_text('The text is missing for the selected verses.  ' +
-                      'Please enter the text in the enter verses screen, ' +
-                      'or edit the current session.')
+        self.set_text(MISSING_TEXT)
+        self.missing = True
 
     def set_title(self, title):
         # accessor
@@ -170,6 +311,14 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         del self.state
         self.state = bridge.speedtype.State()
         self.caret.charpos = 0
+        self.caret.buflen = len(self.state.buf())
+        self.caret.eobuf = len(self.state.buf()) - 1
+        self._stop_loader()
+        self.pending = deque()
+        self.pending_height = 0
+        self.loaded = 0
+        self.missing = False
+        self._clear_render()
 
     def set_text(self, text):
         """Sets the text to be displayed in the canvas."""
@@ -190,11 +339,24 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         long.  This method lets you feed one sentence at a time.
 
         """
-        self._process_text(sentence_text)
+        self.append_sentences([sentence_text])
+
+    def append_sentences(self, sentence_texts):
+        """Appends the sentences to the view.
+
+        Same as append_sentence(), but processes all the sentences in
+        one go.
+
+        """
+        lines = []
+        for text in sentence_texts:
+            lines.extend(self.engine.layout(text))
+        self.engine.flush()
+        self.state.process_lines(lines)
 
         self.caret.buflen = len(self.state.buf())
         self.caret.eobuf = len(self.state.buf()) - 1
-        self._render()
+        self._render_appended()
 
     def _process_text(self, text):
         """Processes the given text.
@@ -204,109 +366,239 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         The list of words is used to show or hide words.
 
         """
-        for line in self.engine.layout(text):
-            self.state.process_line(line)
+        self.state.process_lines(self.engine.layout(text))
 
     def set_level(self, level):
         """Sets the difficulty level."""
         self.session["level"] = level
-        self.persist_session()
         self._apply_level(level)
-        self._render()
+        self.persist_session()
+        self._render_letters()
         self.update()
 
-    def _apply_level(self, level):
-        """Applies the difficulty level.
+    def _defer_sentences(self, sentence_texts):
+        """Queues up the sentences to be laid out when the viewport
+        gets near them.
 
-        Sets the difficulty level and shows or hides some words as
-        appropriate.
+        Used by a virtual canvas instead of append_sentences().  The
+        canvas is sized by an estimate of the height of the sentences,
+        so the scroll bar covers the whole text from the start.
+
+        """
+        for text in sentence_texts:
+            self.pending.append(text)
+            self.pending_height += self._estimate_height(text)
+        self._fit_height()
+
+    def _restore_pending(self, sentence_texts):
+        self._stop_loader()
+        self.pending = deque()
+        self.pending_height = 0
+        self._defer_sentences(sentence_texts)
+
+    def _estimate_height(self, text):
+        """Estimates the height of the sentence once laid out."""
+        lines = len(text) // graphlayout.OPTIMAL_LINE_WIDTH + 1
+        return lines * self.render['line_spacing']
+
+    def _append_pending(self, count, lines):
+        """Appends the lines laid out from the first count pending
+        sentences.
+
+        The difficulty level is applied to the new lines as they come.
+        The words appended before are at the level already, and may
+        have been revealed since, so they are left as they are.
+
+        """
+        for _ in range(count):
+            text = self.pending.popleft()
+            self.pending_height -= self._estimate_height(text)
+        self.loaded += count
+
+        first = self.state.sentence_count()
+        self.state.process_lines(lines)
+        self.state.apply_level(int(self.session['level']), first)
+
+        self.caret.buflen = len(self.state.buf())
+        self.caret.eobuf = len(self.state.buf()) - 1
+        self._render_appended()
+
+    def _first_screenful(self, sentence_texts):
+        """Returns the number of sentences estimated to fill the
+        viewport."""
+        height = 0
+        for (i, text) in enumerate(sentence_texts):
+            if height >= self.caret.viewport_height:
+                return i
+            height += self._estimate_height(text)
+        return len(sentence_texts)
+
+    def _load_in_background(self):
+        """Starts laying out all the pending sentences in a
+        SentenceLoader."""
+        self._stop_loader()
+        if len(self.pending) > 0:
+            self._start_loader(len(self.pending))
+
+    def _load_until(self, bottom):
+        """Starts laying out the pending sentences estimated to take
+        the text down to bottom in a SentenceLoader, unless one is
+        running already.
+
+        The sentences are laid out in order, as the buffer can only be
+        appended to.
+
+        """
+        if self.loader is not None:
+            return
+
+        y = self.render['end'][1]
+        count = 0
+        for text in self.pending:
+            if y >= bottom:
+                break
+            y += self._estimate_height(text)
+            count += 1
+        if count > 0:
+            self._start_loader(count)
+
+    def _start_loader(self, count):
+        """Starts laying out the first count pending sentences.
+
+        The loader lays out with an engine of its own, so that the
+        canvas can go on using its engine on the GUI thread.
+
+        """
+        self.loader = SentenceLoader(self.engine.fork(),
+                                     list(islice(self.pending, count)))
+        self.loader.ready.connect(self._drain_loader)
+        self.loader.start()
+
+    def _stop_loader(self):
+        if self.loader is not None:
+            self.loader.ready.disconnect(self._drain_loader)
+            self.loader.cancel()
+            self.loader.wait()
+            self.loader = None
+
+    @Qt.pyqtSlot()
+    def _drain_loader(self, block=False):
+        """Appends the sentences the loader has laid out so far.
+
+        If block is set, waits for at least one batch to arrive.
 
         """
-        for sentence in self.state.sentences():
-            words = [self.state.words()[index] for index in sentence]
-            self._apply_level_words(level, words)
+        loader = self.loader
+        appended = False
+        finished = False
+        while loader is not None:
+            try:
+                batch = loader.batches.get(block=block)
+            except queue.Empty:
+                break
+            block = False
+
+            if batch is None:
+                loader.wait()
+                self.loader = None
+                finished = True
+                break
+            else:
+                (count, lines) = batch
+                self._append_pending(count, lines)
+                appended = True
 
-    def _apply_level_words(self, level, words):
-        """Applies the difficulty level in the given words.
+        if config.VIRTUAL_CANVAS and (appended or finished):
+            self._update_window()
+        if appended:
+            self.update()
+
+    def _load_ahead(self):
+        """Makes sure there is more text ahead of the caret, waiting for
+        the loader if need be."""
+        if self.loader is None:
+            self._load_until(self.render['end'][1] +
+                             self.caret.viewport_height)
+        self._drain_loader(block=True)
+
+    @Qt.pyqtSlot()
+    def _update_window(self):
+        """Keeps only the text near the viewport rendered.
+
+        Starts laying out the pending sentences that come into reach,
+        restores the blocks that come near the viewport, and evicts
+        the blocks that have gone far from it.  The block of the caret
+        is kept, as typing goes on there wherever the view is.
+
+        """
+        viewport = window.scroll_area.viewport().height()
+        top = window.scroll_area.verticalScrollBar().value()
+        margin = viewport * VIEWPORT_MARGIN
+        (near_top, near_bottom) = (top - margin, top + viewport + margin)
+
+        self._load_until(near_bottom)
+
+        caret = self._block_of(self.caret.charpos)
+        for block in self.render['blocks']:
+            near = block is caret or \
+                (block['bottom'] >= near_top and block['top'] <= near_bottom)
+            if near and not block['resident']:
+                self._restore_block(block)
+            elif not near and block['resident']:
+                self._evict_block(block)
+
+    def _evict_block(self, block):
+        """Drops what has been rendered of the block, and the records
+        of its characters and words."""
+        block['letters'] = None
+        block['coords'] = None
+        block['lines'] = None
+        block['resident'] = False
+        self.state.evict_records(block['start'], block['end'])
+
+    def _restore_block(self, block):
+        """Renders the block again from the state."""
+        self.state.restore_records(block['start'], block['end'])
+        self._render_block(block)
+        self.update(0, block['top'], self.width(),
+                    block['bottom'] - block['top'] +
+                    self.render['line_spacing'])
+
+    def _block_of(self, index):
+        """Returns the block of the character at index, or None if it
+        has not been rendered."""
+        blocks = self.render['blocks']
+        if len(blocks) == 0 or index >= blocks[-1]['end']:
+            return None
+        return blocks[bisect_right(self.render['starts'], index) - 1]
+
+    def _blocks_between(self, top, bottom):
+        """Returns the blocks with lines that overlap top to bottom."""
+        tops = self.render['tops']
+        first = max(0, bisect_right(tops, top - self.render['fontheight']) - 1)
+        return self.render['blocks'][first:bisect_right(tops, bottom)]
+
+    def _coord(self, index):
+        """Returns the coordinates of the character at index, restoring
+        its block if it has been evicted."""
+        block = self._block_of(index)
+        if not block['resident']:
+            self._restore_block(block)
+        return block['coords'][index - block['start']]
+
+    def _apply_level(self, level):
+        """Applies the difficulty level.
 
         Sets the difficulty level and shows or hides some words as
         appropriate.
 
         """
-        remaining = [w for w in words if w['behind'] == False]
-        word_count = len(remaining)
-        if word_count == 0:
-            return
-        hidden = len([w for w in remaining if w['visible'] == False])
-
-        rate = hidden / word_count
-        target = Levels[level]['hidden_words']
-
-        if rate < target:
-            # maybe hide more words
-            count = 0
-            while (hidden + count) / word_count <= target:
-                count = count + 1
-            # don't exceed the target
-            count = count - 1
-
-            if count > 0:
-                self._hide_random_words(words, count)
-        elif rate > target:
-            # reveal some words
-            count = 0
-            while (hidden - count) / word_count > target:
-                count = count + 1
-            if count > 0:
-                self._reveal_random_words(words, count)
-        else:
-            # do nothing
-            pass
-
-    def _hide_random_words(self, words, count):
-        """Hides the given number, count, of words from words."""
-        assert(len(words) >= count)
-
-        # all shown words that are untouched
-        words = [w for w in words if w['visible'] == True and w['behind'] == False]
-        for _ in range(0, count):
-            pick = randrange(len(words))
-
-            # Not hiding words that have been touched.  This means the
-            # hidden word ratio may sometimes be a little wrong, but
-            # we don't care about accuracy here.
-            if words[pick]['touched'] == False:
-                self._hide_word(words[pick])
-
-            del words[pick]
-
-    def _reveal_random_words(self, words, count):
-        """Reveals the given number, count, of words from words."""
-        assert(len(words) >= count)
-
-        # all hidden words that are untouched
-        words = [w for w in words if w['visible'] == False and w['behind'] == False]
-        for _ in range(0, count):
-            pick = randrange(len(words))
-            self._show_word(words[pick])
-            del words[pick]
-
-    def _hide_word(self, word):
-        """hides a specific word"""
-        word['visible'] = False
-        for ch in [ch for ch in self.state.buf() if ch['word'] == word['id']]:
-            ch['visible'] = False
-
-    def _show_word(self, word):
-        """shows a specific word"""
-        word['visible'] = True
-        for ch in [ch for ch in self.state.buf() if ch['word'] == word['id']]:
-            ch['visible'] = True
+        self.state.apply_level(level)
 
     def edit_session(self):
         """show dialog to edit the current session"""
         dialog = Qt.QDialog(self)
-        uic.loadUi('edit-session.ui', dialog)
+        uicache.load_ui('edit-session.ui', dialog)
 
         dialog.edit_name.setText(self.session['name'])
         start = self.session['range']['start']
@@ -333,7 +625,7 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
                 self.edit_session()
                 return
 
-            if dialog.edit_level.text().strip() != '':
+            if session.valid_level(dialog.edit_level.text().strip()):
                 level = int(dialog.edit_level.text())
             else:
                 # try again
@@ -348,8 +640,6 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
             start['book'] = book
             start['chapter'] = chapter
             self.session = sess
-
-            session.store(self.session)
             self._start_session()
 
     def _start_session(self):
@@ -360,22 +650,21 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         book = loc['book']
         chapter = str(loc['chapter'])
 
-        records = model.verse.find_by_book_and_chapter(book, int(chapter))
-        sentences, _ = sentences_cons2(records)
-
-        if len(sentences) > 0:
+        texts = self._session_texts()
+        if len(texts) > 0:
             label = self.session['name'] + ' ' + book + ' ' + chapter
             self.set_title(label + ' (' + config.translation.upper() + ')')
 
             self.clear_text()
-            for sentence in sentences:
-                text = sentence['text']
-
-                # Remove square brackets [] found in some translation
-                # because it's very awkward to type those in.
-                text = text.replace('[', '').replace(']', '')
-
-                self.append_sentence(text)
+            if config.VIRTUAL_CANVAS:
+                self._defer_sentences(texts)
+            else:
+                # Make the first screenful typeable right away, and
+                # load the rest in the background.
+                first = self._first_screenful(texts)
+                self.append_sentences(texts[:first])
+                self.loaded = first
+                self._defer_sentences(texts[first:])
 
             # The index is expected to match the id property.
             assert([i for (i, w) in enumerate(self.state.words()) if i == w['id']] ==
@@ -387,29 +676,76 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
 
             self._apply_level(level)
             self._render()
+            if config.VIRTUAL_CANVAS:
+                self._update_window()
+            else:
+                self._load_in_background()
             if not self.caret.visible_in_viewport(window.speedtype.y()):
                 # Defer this action until the initialisation
                 # completes.
                 Qt.QTimer.singleShot(0, self._reveal_caret)
-            self.make_cliptable()
             self.update()
         else:
             self.set_missing_text()
-            self.make_cliptable()
             self.update()
 
+        # the journal is replayed on top of this snapshot.
+        self.persist_session()
+
+    def _session_texts(self):
+        """Returns the text of each sentence of the session."""
+        loc = self.session['range']['start']
+        records = model.verse.find_by_book_and_chapter(loc['book'],
+                                                       int(loc['chapter']))
+        sentences, _ = sentences_cons2(records)
+
+        # Remove square brackets [] found in some translation
+        # because it's very awkward to type those in.
+        return [sentence['text'].replace('[', '').replace(']', '')
+                for sentence in sentences]
+
+    def _journal_keystroke(self, record, pos, *args):
+        """Records the keystroke in the journal.  Takes a snapshot once
+        the journal grows long.
+
+        Keystrokes in text appended since the last snapshot are taken
+        in a new snapshot instead, as the journal is replayed onto the
+        text of the snapshot.
+
+        """
+        if pos >= self.snapshot_buflen:
+            self.persist_session()
+            return
+
+        record(pos, *args)
+        if self.journal.records >= session.COMPACT_RECORDS:
+            self.persist_session()
+        elif not self.snapshot_timer.isActive():
+            self.snapshot_timer.start()
+
     @Qt.pyqtSlot()
     def persist_session(self):
-        """Persists the session and user's progress."""
+        """Persists the session and user's progress.
+
+        Takes a snapshot of the session, and starts a new journal for
+        the keystrokes that follow.
+
+        """
         if self.state.buf() is not None and self.state.words() is not None:
+            # The text is laid out again from the verses on resumption,
+            # so only the progress is stored.
             self.session['progress'] = {
-                'buf': self.state.buf(),
-                'words': self.state.words(),
-                'sentences': self.state.sentences(),
                 'caret': self.caret.persist(),
                 'title': self.title,
+                'layout': repr(self.engine.cache_key()),
+                'loaded': self.loaded,
+                'missing': self.missing,
+                'columns': self.state.progress_columns(),
             }
-        session.store(self.session)
+            self.snapshot_buflen = len(self.state.buf())
+        self.snapshot_timer.stop()
+        self.journal = session.compact(self.session, self.journal)
+        self.session['progress'] = None
 
     def _resume_session(self):
         """Read the persisted session from the disk and prepare it for
@@ -426,7 +762,7 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
             if sess is not None and \
                sess['range']['start']['translation'] != config.translation:
                 print('translation mismatch - starting a new session')
-                os.rename(session.SESSION_FILE, session.SESSION_FILE +
+                os.rename(session.current_file(), session.current_file() +
                           '.' + sess['range']['start']['translation'])
                 sess = None
         except session.InvalidSessionError as e:
@@ -434,7 +770,8 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
             # Make a backup of the broken session file.  The
             # documentation says this will fail on Windows if the
             # target file already exists.
-            os.rename(session.SESSION_FILE, 'invalid-' + session.SESSION_FILE)
+            os.rename(session.current_file(),
+                      'invalid-' + session.current_file())
             sess = None
 
         # Resumption failed, initialise a new session.
@@ -459,13 +796,24 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         else:
             progress = None
  
+        if progress is not None:
+            if 'columns' in progress:
+                restored = self._rebuild(progress)
+            else:
+                restored = self._restore_legacy(progress)
+            if not restored:
+                print('the text has changed - starting the session anew')
+                progress = None
+
         if progress is None:
             self._start_session()
         else:
-            self.state.set_buf(progress['buf'])
-            self.state.set_words(progress['words'])
-            self.state.set_sentences(progress['sentences'])
             self.caret.restore(progress['caret'])
+            try:
+                self._replay(progress['journal'])
+            except session.InvalidSessionError as e:
+                # The keystrokes up to the broken record are kept.
+                print('failed to replay the journal', e)
             self.set_title(progress['title'])
 
             # adjust difficulty level according to the session property.
@@ -474,70 +822,144 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
 
             self._apply_level(level)
             self._render()
+            if config.VIRTUAL_CANVAS:
+                self._update_window()
+            else:
+                self._load_in_background()
             if not self.caret.visible_in_viewport(window.speedtype.y()):
                 # Defer this action until the initialisation
                 # completes.
                 Qt.QTimer.singleShot(0, self._reveal_caret)
-            self.make_cliptable()
             self.update()
 
+            # starts a new journal on top of the replayed one.
+            self.persist_session()
+
+    def _rebuild(self, progress):
+        """Lays out the text of the session again, and applies the
+        progress stored in the snapshot.
+
+        Returns False if the text comes out different, e.g. because
+        the verses or the layout engine have changed.
+
+        """
+        if progress['layout'] != repr(self.engine.cache_key()):
+            return False
+
+        if progress['missing']:
+            texts = [MISSING_TEXT]
+        else:
+            texts = self._session_texts()
+        loaded = progress['loaded']
+
+        self.clear_text()
+        lines = []
+        for text in texts[:loaded]:
+            lines.extend(self.engine.layout(text))
+        self.engine.flush()
+        self.state.process_lines(lines)
+
+        columns = progress['columns']
+        if len(self.state.buf()) != len(columns['visible']) or \
+           len(self.state.words()) != len(columns['word_visible']):
+            return False
+
+        snapshot.fill_typed(columns, self.state.characters_array()['character'])
+        self.state.restore_columns(columns)
+        self.loaded = loaded
+        self.missing = progress['missing']
+        self._restore_pending(texts[loaded:])
+        return True
+
+    def _restore_legacy(self, progress):
+        """Restores the progress stored in JSON by earlier versions."""
+        self.state.restore(progress['buf'], progress['words'],
+                           progress['sentences'])
+        # earlier versions laid out the whole text at once.
+        self.loaded = len(self._session_texts())
+        self._restore_pending([])
+        return True
+
+    def _replay(self, records):
+        """Replays the keystrokes journaled since the snapshot.
+
+        Keystrokes are only journaled in the text of the last snapshot,
+        so a record past the end of the text means the journal does
+        not belong to the snapshot.  Raises InvalidSessionError then,
+        having replayed the records before it.
+
+        """
+        buflen = len(self.state.buf())
+        for record in records:
+            pos = record[1]
+            if pos >= buflen:
+                raise session.InvalidSessionError(
+                    'journaled keystroke at {0} past the text of {1} '
+                    'characters'.format(pos, buflen))
+
+            if record[0] == 't':
+                self.state.type_char(pos, record[2])
+                if pos + 1 < buflen:
+                    self.caret.charpos = pos + 1
+            else:
+                self.state.backspace(pos)
+                self.caret.charpos = pos
+
     def showEvent(self, event):
-        """Handles the first time show event to set up the session."""
-        if not event.spontaneous():
+        """Handles the first time show event to set up the session.
+        The form may be hidden and shown again by screen.switch_to(),
+        which resumes the canvas instead."""
+        if not event.spontaneous() and self.caret is None:
             self.caret = Caret(self.render['fm'].height(),
                                window.scroll_area.viewport().height())
             window.resized.connect(self.update_caret_for_resize)
+            if config.VIRTUAL_CANVAS:
+                scroll_bar = window.scroll_area.verticalScrollBar()
+                scroll_bar.valueChanged.connect(self._update_window)
+                window.resized.connect(self._update_window)
 
             self._resume_session()
 
     def keyPressEvent(self, event):
+        if self.latency is not None:
+            self.latency.key_pressed()
+
+        caretpos = self.caret.charpos
         if event.key() == Qt.Qt.Key_Backspace:
             if self.caret.backward():
-                ch = self.state.buf()[self.caret.charpos]
-                ch['typed'] = None
-                ch['correct'] = False
-                if ch['word'] is not None:
-                    word = self.state.words()[ch['word']]
-                    word['behind'] = False
-
-                self.persist_timer.start()
+                with self._measure('bridge'):
+                    dirty = self.state.backspace(self.caret.charpos)
+                self._journal_keystroke(self.journal.erased,
+                                        self.caret.charpos)
 
-                self._render()
+                with self._measure('render'):
+                    self._render_keystroke(dirty, caretpos)
                 if not self.caret.visible_in_viewport(window.speedtype.y()):
                     self._reveal_caret()
-                self.update()
             else:
                 # caret at the beginning of the text
                 pass
         elif event.text() != '':
-            ch = self._char_at_caret()
-            ch['typed'] = event.text()
-            if event.text() == ch['char']:
-                ch['correct'] = True
-            else:
-                ch['correct'] = False
-
-            maybe_word = self._word_at_caret()
-            if maybe_word is not None:
-                word = maybe_word
-                word['touched'] = True
+            if len(self.pending) > 0 and self.caret.charpos + \
+               MATERIALIZE_AHEAD >= len(self.state.buf()):
+                self._load_ahead()
 
-                # we are at the last letter, which means we are done
-                # with this word.
-                if self.caret.charpos == word['characters'][-1]:
-                    word['behind'] = True
-
-            self.persist_timer.start()
+            # The word becomes behind if this is its last letter.
+            with self._measure('bridge'):
+                dirty = self.state.type_char(self.caret.charpos,
+                                             event.text()[0])
+            self._journal_keystroke(self.journal.typed, self.caret.charpos,
+                                    event.text()[0])
 
             if self.caret.forward():
-                self._render()
+                with self._measure('render'):
+                    self._render_keystroke(dirty, caretpos)
                 if not self.caret.visible_in_viewport(window.speedtype.y()):
                     self._reveal_caret()
-                self.update()
             else:
                 # Finished?
-                self._render()
-                self.update()
+                with self._measure('render'):
+                    self._render_keystroke(dirty, caretpos)
                 Qt.QApplication.postEvent(self, SessionCompleteEvent())
         else:
             return super(SpeedTypeCanvas, self).keyPressEvent(event)
@@ -580,11 +1002,27 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         else:
             assert False, "Unexpected button clicked"
 
+    def suspend(self):
+        """Takes a snapshot of the session while the form is hidden."""
+        if self.journal is not None and self.journal.records > 0:
+            self.persist_session()
+
+    def resume(self):
+        """Starts the session again if its text was missing, in case it
+        has been entered while the form was hidden."""
+        if self.missing and len(self._session_texts()) > 0:
+            self._start_session()
+
     def persist_on_exit(self):
         """Persists the session and progress before exiting."""
-        if self.persist_timer.isActive():
-            self.persist_timer.stop()
+        self._stop_loader()
+        if self.latency is not None and config.LATENCY_REPORT is not None:
+            self.latency.flush(config.LATENCY_REPORT)
+        if self.journal is not None and self.journal.records > 0:
             self.persist_session()
+        if self.journal is not None:
+            self.journal.close()
+        session.flush()
 
     def event(self, event):
         """Processes custom events."""
@@ -598,113 +1036,201 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         """Prepares the canvas for rendering.
 
         This method transforms the internal data into a data structure
-        that can be used by paintEvent() method to draw the screen
+        that can be used by paintEvent() method to draw the screen.
+        It goes through the whole buffer, so it is only used when the
+        text changes.  Keystrokes go through _render_keystroke()
+        instead, and level changes through _render_letters().
 
         """
-        letters = []
-        y = 0
-        x = 0
-        ct_info = []
-
-        for (i, ch) in enumerate(self.state.buf()):
-            if i == self.caret.charpos:
-                self.caret.pos = (x, y)
-
-            if ch['char'] == '\n':
-                x = 0
-                y = y + self.render['line_spacing']
-            else:
-                if ch['typed'] is None:
-                    if ch['visible'] == True:
-                        (letter, colour) = (ch['char'], config.COLOURS['guide'])
-                    elif ch['whitespace']:
-                        (letter, colour) = (' ', 'white')
-                    else:
-                        (letter, colour) = ('_', config.COLOURS['underscore'])
-                elif ch['correct'] == True:
-                    (letter, colour) = self._render_correct_char(ch)
-                else:
-                    (letter, colour) = self._render_incorrect_char(ch)
-
-                letters.append({
-                    'letter': letter,
-                    'colour': colour,
-                    'coord': (x, y),
-                })
-                x = x + self._width(ch['char'])
-
-                ct_info.append(y)
-
-        self.render['letters'] = letters
-        self.render['ct_info'] = ct_info
-        self.render['caret'] = self.caret.render()
+        self._clear_render()
+        self._render_appended()
+
+    def _clear_render(self):
+        """Forgets everything rendered so far."""
+        self.render['end'] = (0, 0)
+        self.render['blocks'] = []
+        self.render['starts'] = []
+        self.render['tops'] = []
+
+    def _render_appended(self):
+        """Renders the characters appended to the buffer since the last
+        time it was rendered.
 
-        # Fix the height of the canvas so the entire content may be
-        # visible.
+        Appended text always starts on a line of its own.  It goes into
+        the last block while that has room and is resident, and into
+        new blocks after that.
+
+        """
+        blocks = self.render['blocks']
+        (x, y) = self.render['end']
+
+        buf = self.state.buf()
+        start = blocks[-1]['end'] if len(blocks) > 0 else 0
+        for i in range(start, len(buf)):
+            if len(blocks) == 0 or blocks[-1]['newlines'] == BLOCK_LINES or \
+               not blocks[-1]['resident']:
+                blocks.append({'start': i, 'end': i, 'top': y, 'bottom': y,
+                               'newlines': 0, 'resident': True,
+                               'letters': [], 'coords': [],
+                               'lines': LineIndex(self.render['fontheight'])})
+                self.render['starts'].append(i)
+                self.render['tops'].append(y)
+
+            block = blocks[-1]
+            block['end'] = i + 1
+            block['bottom'] = y
+            if buf[i]['char'] == '\n':
+                block['newlines'] += 1
+            (x, y) = self._render_into(block, buf[i], x, y)
+
+        self.render['end'] = (x, y)
+        self._render_caret()
+        self._fit_height()
+
+    def _render_block(self, block):
+        """Renders the characters of the block from scratch.  A block
+        starts on a line of its own."""
+        block['letters'] = []
+        block['coords'] = []
+        block['lines'] = LineIndex(self.render['fontheight'])
+        block['resident'] = True
+
+        buf = self.state.buf()
+        (x, y) = (0, block['top'])
+        for i in range(block['start'], block['end']):
+            (x, y) = self._render_into(block, buf[i], x, y)
+
+    def _render_into(self, block, ch, x, y):
+        """Renders the character at x, y as the next in the block.
+        Returns where the character after it goes."""
+        block['coords'].append((x, y))
+        block['lines'].append(y)
+        if ch['char'] == '\n':
+            block['letters'].append(None)
+            return (0, y + self.render['line_spacing'])
+        else:
+            (letter, colour) = self._render_char(ch)
+            block['letters'].append({
+                'letter': letter,
+                'colour': colour,
+                'coord': (x, y),
+            })
+            return (x + self._width(ch['char']), y)
+
+    def _render_letters(self):
+        """Renders the letters of the resident blocks again where they
+        are, e.g. after the level has changed.  Evicted blocks are
+        rendered afresh when they are restored."""
+        buf = self.state.buf()
+        for block in self.render['blocks']:
+            if block['resident']:
+                for (i, letter) in enumerate(block['letters'], block['start']):
+                    if letter is not None:
+                        (letter['letter'], letter['colour']) = \
+                            self._render_char(buf[i])
+        self._render_caret()
+
+    def _fit_height(self):
+        """Fixes the height of the canvas so the entire content may be
+        visible.  This includes the estimated height of the sentences
+        that are not laid out yet."""
+        y = self.render['end'][1] + self.pending_height
         if y > 0: self.setMinimumHeight(y + self.render['line_spacing'])
 
-    def _width(self, char):
-        """Provides caching for calculating the width of the character."""
-        if not char in self.fmcache:
-            self.fmcache[char] = self.render['fm'].width(char)
-        return self.fmcache[char]
+    def _render_keystroke(self, dirty, caretpos):
+        """Updates the rendering after a keystroke.
 
-    def make_cliptable(self):
-        """Populates the cliptable, used to paint only what is necessary."""
-        cliptable = []
-        ct_info = self.render['ct_info']
-        fontheight = self.render['fontheight']
+        Only the character described by the dirty record and the caret,
+        which was at caretpos before the keystroke, are rendered again.
+        Only the lines they are on are repainted.
 
-        if len(ct_info) > 0:
-            for y in range(0, self.height()):
-                (first, second) = (None, None)
+        """
+        lines = set()
+
+        block = self._block_of(dirty.character)
+        # the block may have been evicted, in which case the letter is
+        # rendered from the state when the block is restored.
+        if block['resident']:
+            i = dirty.character - block['start']
+            letter = block['letters'][i]
+            if letter is not None:
+                ch = self.state.buf()[dirty.character]
+                (letter['letter'], letter['colour']) = self._render_char(ch)
+                lines.add(block['coords'][i][1])
+
+        lines.add(self._coord(caretpos)[1])
+        self._render_caret()
+        lines.add(self.caret.pos[1])
+
+        for y in lines:
+            self.update(self._line_rect(y))
+
+    def _render_caret(self):
+        """Moves the caret to the coordinates of the character at the
+        caret."""
+        if self._block_of(self.caret.charpos) is not None:
+            self.caret.pos = self._coord(self.caret.charpos)
+        self.render['caret'] = self.caret.render()
 
-                for (i, yclip) in enumerate(ct_info):
-                    if y < yclip + fontheight:
-                        first = i
-                        break
+    def _render_char(self, ch):
+        """Returns the letter to show for the character and its
+        colour."""
+        if ch['typed'] is None:
+            if ch['visible'] == True:
+                return (ch['char'], config.COLOURS['guide'])
+            elif ch['whitespace']:
+                return (' ', 'white')
+            else:
+                return ('_', config.COLOURS['underscore'])
+        elif ch['correct'] == True:
+            return self._render_correct_char(ch)
+        else:
+            return self._render_incorrect_char(ch)
 
-                for i in range(len(ct_info) - 1, -1, -1):
-                    yclip = ct_info[i]
-                    if y > yclip:
-                        second = i
-                        break
+    def _line_rect(self, y):
+        """Returns the area of the line at y, for repainting."""
+        height = max(self.render['line_spacing'], self.render['fontheight'])
+        return QtCore.QRect(0, y, self.width(), height)
 
-                cliptable.append((first, second))
-            self.render['cliptable'] = cliptable
+    def _width(self, char):
+        """Provides caching for calculating the width of the character."""
+        if not char in self.fmcache:
+            self.fmcache[char] = self.render['fm'].width(char)
+        return self.fmcache[char]
 
     def paintEvent(self, event):
         qp = QtGui.QPainter()
         qp.begin(self)
         qp.fillRect(event.rect(), self.render['background'])
-        qp.setFont(self.render['font'])
-
-        letters = self.render['letters']
-        cliptable = self.render['cliptable']
-
-        if cliptable is not None:
-            letter_start = cliptable[event.rect().y()][0]
-            letter_end = cliptable[event.rect().y() + event.rect().height() - 1][1]
 
-            for letter in letters[letter_start:letter_end + 1]:
-                self._paint_letter(qp, self.render, letter)
-
-        self._paint_caret(qp, self.render['caret'])
+        rect = event.rect()
+        with self._measure('lookup'):
+            runs = [(block['letters'],
+                     block['lines'].letters_between(rect.top(), rect.bottom()))
+                    for block in self._blocks_between(rect.top(), rect.bottom())
+                    if block['resident']]
+        with self._measure('paint'):
+            for (letters, indices) in runs:
+                self.render['glyphs'].paint(qp, letters, indices)
+            self._paint_caret(qp, self.render['caret'])
         qp.end()
 
-    def _paint_letter(self, qp, render, letter):
-        ch = letter['letter']
-        colour = QtGui.QColor(letter['colour'])
-        coord = letter['coord']
+        if self.latency is not None:
+            self.latency.painted()
 
-        qp.setPen(colour)
-        qp.drawText(coord[0], coord[1] + render['fm'].ascent(), ch)
+    def _measure(self, stage):
+        """Times the body of the with statement as the stage of the
+        keystroke, if latency is being measured."""
+        if self.latency is not None:
+            return self.latency.measure(stage)
+        else:
+            return nullcontext()
 
     def _paint_caret(self, qp, render):
         if render is not None:
             (x, y) = render['pos']
-            qp.fillRect(x, y, render['width'], render['height'],
-                        QtGui.QColor(render['colour']))
+            colour = self.render['glyphs'].pen(render['colour']).color()
+            qp.fillRect(x, y, render['width'], render['height'], colour)
 
     @Qt.pyqtSlot()
     def _reveal_caret(self):
@@ -731,10 +1257,7 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
         Returns the word at the caret, or None if there is none found.
 
         """
-        if self._char_at_caret()['word'] is not None:
-            return self.state.words()[self._char_at_caret()['word']]
-        else:
-            return None
+        return self.state.word_of(self.caret.charpos)
 
     def _render_correct_char(self, char):
         """Handles the case where user typed the correct character"""
@@ -742,12 +1265,60 @@ class SpeedTypeCanvas(QtWidgets.QWidget):
 
     def _render_incorrect_char(self, char):
         """Handles the case where user typed the incorrect character"""
-        index = char['word']
-        if index is not None and self.state.words()[index]['visible'] == True:
+        word = self.state.word_of(char['id'])
+        if word is not None and word['visible'] == True:
             return (char['char'], config.COLOURS['incorrect'])
         else:
             return (char['typed'], config.COLOURS['incorrect'])
 
+class SentenceLoader(QtCore.QThread):
+    """Lays out sentences in the background.
+
+    The lines of every MATERIALIZE_BATCH sentences are put in batches
+    as a (count, lines) tuple, followed by None once all the
+    sentences are laid out.  ready is emitted after each, so that the
+    canvas can take them on the GUI thread, where the speedtype state
+    lives.
+
+    The engine is the loader's own, e.g. made by CachedLayout.fork(),
+    and is closed when the loader finishes or is cancelled.
+
+    """
+    ready = Qt.pyqtSignal()
+
+    def __init__(self, engine, sentence_texts):
+        super(SentenceLoader, self).__init__()
+        self.engine = engine
+        self.sentence_texts = sentence_texts
+        self.batches = queue.Queue()
+        self._cancelled = False
+
+    def cancel(self):
+        """Asks the loader to stop at the next sentence."""
+        self._cancelled = True
+
+    def run(self):
+        try:
+            self._lay_out()
+        finally:
+            self.engine.close()
+
+    def _lay_out(self):
+        texts = self.sentence_texts
+        for start in range(0, len(texts), MATERIALIZE_BATCH):
+            batch = texts[start:start + MATERIALIZE_BATCH]
+            lines = []
+            for text in batch:
+                if self._cancelled:
+                    return
+                lines.extend(self.engine.layout(text))
+            self.engine.flush()
+            self.batches.put((len(batch), lines))
+            self.ready.emit()
+
+        self.batches.put(None)
+        self.ready.emit()
+
 class SessionCompleteEvent(Qt.QEvent):
     """Custom event that is fired when the session is complete."""
     def __init__(self):
@@ -778,6 +1349,10 @@ def _debug_view_db():
     from dbgviewdb import DbgViewDb
     DbgViewDb().gui.show()
 
+def _debug_verse_cache():
+    QtWidgets.QMessageBox.information(window.gui, 'Debug – Verse Cache',
+                                      model.verse.cache_summary())
+
 def _debug_sentences():
     from sentence import sentence_make_label
     from dbgsentences import DbgSentences
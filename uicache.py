@@ -0,0 +1,79 @@
+# coding: utf-8
+"""Loads Qt Designer forms from Python modules compiled ahead of time.
+
+uic.loadUi() and uic.loadUiType() parse the .ui file and generate the
+form's code each time they are called.  Instead, each .ui file is
+compiled once with uic.compileUi() into config.UI_CACHE_DIR, and the
+compiled module is imported.  A module older than its .ui file is
+compiled again.  uic itself is only imported to compile, which spares
+starting up the time it takes to import.
+
+"""
+
+import config
+import importlib.util
+import os
+import xml.etree.ElementTree as ElementTree
+from PyQt5 import QtWidgets
+
+"""Compiled forms by the path of their .ui files."""
+_forms = {}
+
+def load_ui_type(path):
+    """Returns the form class and the base class of the .ui file, like
+    uic.loadUiType()."""
+    if config.UI_CACHE_DIR is None:
+        from PyQt5 import uic
+        return uic.loadUiType(path)
+
+    form = _forms.get(path)
+    if form is None:
+        # uic.compileUi() names the form class after the top-level
+        # widget.
+        toplevel = ElementTree.parse(path).getroot().find('widget')
+        form = (getattr(_compiled(path), 'Ui_' + toplevel.get('name')),
+                getattr(QtWidgets, toplevel.get('class')))
+        _forms[path] = form
+    return form
+
+def load_ui(path, baseinstance=None):
+    """Creates the widgets of the .ui file, like uic.loadUi().
+
+    The widgets are set up in baseinstance if given, or in a new
+    instance of the base class otherwise.  Either way, the widgets are
+    available as attributes of the instance returned.
+
+    """
+    if config.UI_CACHE_DIR is None:
+        from PyQt5 import uic
+        return uic.loadUi(path, baseinstance)
+
+    (form_class, base_class) = load_ui_type(path)
+    if baseinstance is None:
+        baseinstance = base_class()
+    form = form_class()
+    form.setupUi(baseinstance)
+    for (name, value) in vars(form).items():
+        setattr(baseinstance, name, value)
+    return baseinstance
+
+def _compiled(path):
+    """Imports the compiled module of the .ui file, compiling it first
+    if it is missing or out of date."""
+    name = 'ui_' + os.path.splitext(os.path.basename(path))[0] \
+                           .replace('-', '_')
+    module_path = os.path.join(config.UI_CACHE_DIR, name + '.py')
+
+    if not os.path.exists(module_path) or \
+       os.path.getmtime(module_path) < os.path.getmtime(path):
+        from PyQt5 import uic
+        os.makedirs(config.UI_CACHE_DIR, exist_ok=True)
+        tmp = module_path + '.tmp'
+        with open(path, 'r') as ui, open(tmp, 'w') as f:
+            uic.compileUi(ui, f)
+        os.replace(tmp, module_path)
+
+    spec = importlib.util.spec_from_file_location(name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module